@@ -1,21 +1,387 @@
 from __future__ import annotations
 
+import asyncio
+import errno
+import fnmatch
 import hashlib
+import inspect
 import logging
-from functools import wraps
-from typing import TYPE_CHECKING, Literal, ParamSpec, TypeVar, cast
+import mmap
+import os
+import re
+import reprlib
+import sqlite3
+import stat
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial, update_wrapper, wraps
+from itertools import islice, pairwise
+from pathlib import Path
+from types import MethodType
+from typing import (
+    TYPE_CHECKING,
+    Concatenate,
+    Generic,
+    Literal,
+    ParamSpec,
+    Protocol,
+    Self,
+    TypeVar,
+    cast,
+    overload,
+    runtime_checkable,
+)
+
+from pyutilkit.timing import Stopwatch, Timing
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
-    from pathlib import Path
+    from collections.abc import (
+        AsyncGenerator,
+        Awaitable,
+        Callable,
+        Coroutine,
+        Generator,
+        Iterable,
+        Iterator,
+        Mapping,
+    )
+    from io import FileIO
+    from types import TracebackType
+
+    from _typeshed import ReadableBuffer, WriteableBuffer
 
 logger = logging.getLogger(__name__)
 INGEST_ERROR = "Function `%s` threw `%s` when called with args=%s and kwargs=%s"
 INGEST_ERROR_WITHOUT_ARGS = "Function `%s` threw `%s`"
+INGEST_SUMMARY = "Function `%s` threw `%s` %d more times in the last %s"
+CIRCUIT_OPENED = "Circuit opened after %d failures in %d calls; retrying in %s"
+CIRCUIT_REOPENED = "Circuit reopened after a failed probe; retrying in %s"
+CIRCUIT_CLOSED = "Circuit closed after %d successful probes"
 R_co = TypeVar("R_co", covariant=True)
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+_S = TypeVar("_S")
 P = ParamSpec("P")
+_P = ParamSpec("_P")
 LogLevel = Literal["debug", "info", "warning", "error", "critical", "exception"]
 LOG_LEVELS = frozenset({"debug", "info", "warning", "error", "critical", "exception"})
+_LOG_LEVEL_NUMBERS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+    "exception": logging.ERROR,
+}
+DEFAULT_BUFFER_SIZE = 2**16
+MAX_AUTO_BUFFER_SIZE = 2**20
+HashEngine = Literal["auto", "read", "readinto", "mmap"]
+NodeKind = Literal["file", "directory", "symlink"]
+CircuitState = Literal["closed", "open", "half_open"]
+HASH_ENGINES = frozenset({"auto", "read", "readinto", "mmap"})
+
+
+DEFAULT_ALGORITHM = "sha256"
+DEFAULT_CACHE_SIZE = 100_000
+DEFAULT_CHUNK_SIZE = 2**24
+DEFAULT_SAMPLE_SIZE = 2**12
+DEFAULT_PROGRESS_INTERVAL = Timing(milliseconds=100)
+DEFAULT_MIN_POLL_INTERVAL = Timing(milliseconds=10)
+DEFAULT_MAX_POLL_INTERVAL = Timing(seconds=1)
+DEFAULT_CIRCUIT_WINDOW = Timing(seconds=10)
+DEFAULT_CIRCUIT_COOLDOWN = Timing(seconds=30)
+DEFAULT_MIN_CHUNK_SIZE = 2**14
+DEFAULT_AVG_CHUNK_SIZE = 2**16
+DEFAULT_MAX_CHUNK_SIZE = 2**18
+_GEAR_MASK = 2**64 - 1
+_GEAR = tuple(
+    int.from_bytes(hashlib.sha256(bytes([byte])).digest()[:8], "big")
+    for byte in range(256)
+)
+_BSD_MANIFEST_LINE = re.compile(
+    r"(?P<algorithm>[\w-]+) \((?P<name>.*)\) = (?P<digest>[0-9a-fA-F]+)"
+)
+_GNU_MANIFEST_LINE = re.compile(r"(?P<digest>[0-9a-fA-F]+) [ *](?P<name>.+)")
+_MANIFEST_ESCAPES = {"n": "\n", "r": "\r"}
+KERNEL_COPY_SIZE = 2**30
+# Errors meaning a kernel copy is not supported for this pair of files, rather
+# than that the copy itself failed.
+_KERNEL_COPY_UNSUPPORTED = frozenset(
+    {
+        errno.EBADF,
+        errno.EINVAL,
+        errno.ENOSYS,
+        errno.ENOTSOCK,
+        errno.ENOTSUP,
+        errno.EOPNOTSUPP,
+        errno.EXDEV,
+    }
+)
+# The failure rate window of a circuit breaker is split into this many buckets.
+CIRCUIT_BUCKETS = 10
+# Files modified this recently may still change without a visible mtime change,
+# depending on the file system's timestamp granularity, so they are not cached.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class _Updatable(Protocol):
+    def update(self, data: ReadableBuffer, /) -> None: ...
+
+
+class _Hasher(_Updatable, Protocol):
+    def digest(self) -> bytes: ...
+
+    def hexdigest(self) -> str: ...
+
+
+@runtime_checkable
+class _Readable(Protocol):
+    def read(self, size: int = -1, /) -> bytes: ...
+
+
+@runtime_checkable
+class _ReadableInto(Protocol):
+    def readinto(self, buffer: WriteableBuffer, /) -> int | None: ...
+
+
+class _ReadableFile(_Readable, _ReadableInto, Protocol):
+    def fileno(self) -> int: ...
+
+
+class _Writable(Protocol):
+    def write(self, data: ReadableBuffer, /) -> int | None: ...
+
+
+class _MultiHasher:
+    """Feed the same data to several hashers."""
+
+    __slots__ = ("_hashers",)
+
+    def __init__(self, hashers: Iterable[_Updatable]) -> None:
+        self._hashers = tuple(hashers)
+
+    def update(self, data: ReadableBuffer, /) -> None:
+        for hasher in self._hashers:
+            hasher.update(data)
+
+
+class HashStats:
+    """Where the time of a `hash_file` call went.
+
+    `read_time` is spent waiting for the file and `update_time` feeding the
+    hash. With the `mmap` engine, reads happen as page faults inside the
+    hash update, so they count towards `update_time`.
+    """
+
+    bytes_read: int
+    read_time: Timing
+    update_time: Timing
+    elapsed: Timing
+    __slots__ = ("bytes_read", "elapsed", "read_time", "update_time")
+
+    def __init__(self) -> None:
+        self.bytes_read = 0
+        self.read_time = Timing()
+        self.update_time = Timing()
+        self.elapsed = Timing()
+
+    @property
+    def throughput(self) -> float:
+        """Bytes hashed per second, over the whole call."""
+        if not self.elapsed:
+            return 0.0
+        return self.bytes_read * 1_000_000_000 / self.elapsed.nanoseconds
+
+
+class _Instrumentation:
+    """Count bytes and time spent reading and hashing, and report progress."""
+
+    __slots__ = (
+        "_interval",
+        "_last_report",
+        "_progress",
+        "_reported",
+        "_start",
+        "bytes_done",
+        "read_ns",
+        "total",
+        "update_ns",
+    )
+
+    def __init__(
+        self,
+        total: int | None,
+        progress: Callable[[int, int | None, Timing], None] | None,
+        interval: Timing,
+    ) -> None:
+        self.total = total
+        self.bytes_done = 0
+        self.read_ns = 0
+        self.update_ns = 0
+        self._progress = progress
+        self._interval = interval.nanoseconds
+        self._start = self._last_report = time.perf_counter_ns()
+        self._reported = -1
+
+    def _report(self, now: int) -> None:
+        if self._progress is None:
+            return
+        self._last_report = now
+        self._reported = self.bytes_done
+        self._progress(
+            self.bytes_done, self.total, Timing(nanoseconds=now - self._start)
+        )
+
+    def updated(self, now: int) -> None:
+        if now - self._last_report >= self._interval:
+            self._report(now)
+
+    def finish(self) -> None:
+        if self._reported != self.bytes_done:
+            self._report(time.perf_counter_ns())
+
+
+class _InstrumentedFile:
+    __slots__ = ("_file", "_instrumentation")
+
+    def __init__(self, f: _ReadableFile, instrumentation: _Instrumentation) -> None:
+        self._file = f
+        self._instrumentation = instrumentation
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def read(self, size: int = -1, /) -> bytes:
+        start = time.perf_counter_ns()
+        data = self._file.read(size)
+        self._instrumentation.read_ns += time.perf_counter_ns() - start
+        return data
+
+    def readinto(self, buffer: WriteableBuffer, /) -> int | None:
+        start = time.perf_counter_ns()
+        size = self._file.readinto(buffer)
+        self._instrumentation.read_ns += time.perf_counter_ns() - start
+        return size
+
+
+class _InstrumentedHasher:
+    __slots__ = ("_hasher", "_instrumentation")
+
+    def __init__(self, hasher: _Updatable, instrumentation: _Instrumentation) -> None:
+        self._hasher = hasher
+        self._instrumentation = instrumentation
+
+    def update(self, data: ReadableBuffer, /) -> None:
+        instrumentation = self._instrumentation
+        start = time.perf_counter_ns()
+        self._hasher.update(data)
+        end = time.perf_counter_ns()
+        instrumentation.update_ns += end - start
+        with memoryview(data) as view:
+            instrumentation.bytes_done += view.nbytes
+        instrumentation.updated(end)
+
+
+@dataclass(frozen=True, slots=True)
+class FileHash:
+    path: Path
+    digest: str | None = None
+    error: OSError | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Chunk:
+    offset: int
+    length: int
+    digest: str
+
+
+@dataclass(frozen=True, slots=True)
+class FileRange:
+    """A byte range of a file, from `start` up to but excluding `end`."""
+
+    path: Path
+    start: int
+    end: int
+    delimiter: bytes = b"\n"
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+@dataclass(frozen=True, slots=True)
+class ManifestReport:
+    """The outcome of verifying files against a checksum manifest.
+
+    `malformed` holds the line numbers of manifest lines that could not be
+    parsed. `complete` is false when verification stopped at the first
+    failure.
+    """
+
+    verified: int
+    missing: tuple[Path, ...]
+    mismatched: tuple[Path, ...]
+    unreadable: tuple[Path, ...]
+    extra: tuple[Path, ...]
+    malformed: tuple[int, ...]
+    complete: bool
+
+    @property
+    def ok(self) -> bool:
+        return self.complete and not (
+            self.missing or self.mismatched or self.unreadable or self.malformed
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class MerkleNode:
+    kind: NodeKind
+    digest: str
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_stat(cls, kind: NodeKind, digest: str, file_stat: os.stat_result) -> Self:
+        return cls(
+            kind=kind,
+            digest=digest,
+            device=file_stat.st_dev,
+            inode=file_stat.st_ino,
+            size=file_stat.st_size,
+            mtime_ns=file_stat.st_mtime_ns,
+        )
+
+    def matches(self, file_stat: os.stat_result) -> bool:
+        return (self.device, self.inode, self.size, self.mtime_ns) == (
+            file_stat.st_dev,
+            file_stat.st_ino,
+            file_stat.st_size,
+            file_stat.st_mtime_ns,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class MerkleTree:
+    """A snapshot of a directory tree and the digest of every node in it.
+
+    `nodes` is keyed on POSIX paths relative to `root`, with the root itself
+    stored as `"."`.
+    """
+
+    root: Path
+    algorithm: str
+    nodes: dict[str, MerkleNode]
+    timestamp_ns: int
+
+    @property
+    def digest(self) -> str:
+        return self.nodes["."].digest
 
 
 def _validate_log_level(log_level: object) -> LogLevel:
@@ -26,53 +392,2228 @@ def _validate_log_level(log_level: object) -> LogLevel:
     return cast("LogLevel", log_level)
 
 
+def _validate_sampling(
+    log_first: int,
+    log_every: int,
+    summary_interval: Timing | None,
+    max_arg_length: int | None,
+) -> None:
+    if log_first < 0:
+        msg = "log_first must not be negative"
+        raise ValueError(msg)
+    if log_every < 1:
+        msg = "log_every must be at least 1"
+        raise ValueError(msg)
+    if summary_interval is not None and summary_interval <= Timing():
+        msg = "summary_interval must be positive"
+        raise ValueError(msg)
+    if max_arg_length is not None and max_arg_length < 1:
+        msg = "max_arg_length must be at least 1"
+        raise ValueError(msg)
+
+
+class _LazyRepr:
+    """Render a value for a log record only if the record is formatted."""
+
+    __slots__ = ("_limit", "_repr", "_value")
+
+    def __init__(self, value: object, repr_: reprlib.Repr, limit: int) -> None:
+        self._value = value
+        self._repr = repr_
+        self._limit = limit
+
+    def __str__(self) -> str:
+        text = self._repr.repr(self._value)
+        if len(text) <= self._limit:
+            return text
+        return text[: max(self._limit - 3, 0)] + "..."
+
+    __repr__ = __str__
+
+
+class _FailureSampler:
+    """Decide which failures of a decorated function are logged.
+
+    The first `log_first` failures of each exception class are logged, and
+    always at least the first one, then one in every `log_every`. The others
+    are counted, and the counts are handed out as summaries at most once per
+    `summary_interval`, when a later failure asks for them.
+    """
+
+    __slots__ = (
+        "_counts",
+        "_last_summary",
+        "_lock",
+        "_log_every",
+        "_log_first",
+        "_summary_interval",
+        "_suppressed",
+    )
+
+    def __init__(
+        self, log_first: int, log_every: int, summary_interval: Timing | None
+    ) -> None:
+        # a class that fails fewer than `log_every` times is still logged
+        self._log_first = max(log_first, 1)
+        self._log_every = log_every
+        self._summary_interval = (
+            None if summary_interval is None else summary_interval.nanoseconds
+        )
+        self._counts: dict[type[BaseException], int] = {}
+        self._suppressed: dict[type[BaseException], int] = {}
+        self._last_summary = time.monotonic_ns()
+        self._lock = threading.Lock()
+
+    def sample(self, exc_type: type[BaseException]) -> bool:
+        with self._lock:
+            count = self._counts.get(exc_type, 0) + 1
+            self._counts[exc_type] = count
+            if (
+                count <= self._log_first
+                or (count - self._log_first) % self._log_every == 0
+            ):
+                return True
+            if self._summary_interval is not None:
+                self._suppressed[exc_type] = self._suppressed.get(exc_type, 0) + 1
+            return False
+
+    def summaries(self) -> tuple[Timing, dict[type[BaseException], int]] | None:
+        """Return the suppressed counts, if a summary is due."""
+        if self._summary_interval is None:
+            return None
+        now = time.monotonic_ns()
+        with self._lock:
+            if not self._suppressed or now - self._last_summary < (
+                self._summary_interval
+            ):
+                return None
+            elapsed = Timing(nanoseconds=now - self._last_summary)
+            suppressed, self._suppressed = self._suppressed, {}
+            self._last_summary = now
+        return elapsed, suppressed
+
+
+@dataclass(frozen=True, slots=True)
+class FunctionMetrics:
+    """Calls, failures, and call latency of a decorated function.
+
+    `failures` counts every exception raised by the function, by class,
+    whether or not it was handled.
+    """
+
+    calls: int
+    failures: Mapping[type[BaseException], int]
+    total_time: Timing
+    min_time: Timing
+    max_time: Timing
+
+    @property
+    def average_time(self) -> Timing:
+        return self.total_time // self.calls if self.calls else Timing()
+
+
+class _CounterShard:
+    """The counters of one function, updated by a single thread."""
+
+    __slots__ = ("calls", "failures", "max_ns", "min_ns", "total_ns")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.failures: dict[type[BaseException], int] = {}
+        self.total_ns = 0
+        self.min_ns: int | None = None
+        self.max_ns = 0
+
+    def merge(self, other: _CounterShard) -> None:
+        self.calls += other.calls
+        for exc_type, count in dict(other.failures).items():
+            self.failures[exc_type] = self.failures.get(exc_type, 0) + count
+        self.total_ns += other.total_ns
+        if other.min_ns is not None and (
+            self.min_ns is None or other.min_ns < self.min_ns
+        ):
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+
+class _FunctionCounters:
+    """Per-thread counters of a function, so that recording takes no lock.
+
+    The shards of finished threads are folded into a single retired shard,
+    whenever the number of shards doubles and on every snapshot.
+    """
+
+    __slots__ = ("_compact_at", "_local", "_lock", "_retired", "_shards")
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list[tuple[threading.Thread, _CounterShard]] = []
+        self._retired = _CounterShard()
+        self._compact_at = 1
+        self._lock = threading.Lock()
+
+    def _new_shard(self) -> _CounterShard:
+        shard = self._local.shard = _CounterShard()
+        with self._lock:
+            self._shards.append((threading.current_thread(), shard))
+            if len(self._shards) > self._compact_at:
+                self._compact()
+        return shard
+
+    def _compact(self) -> None:
+        """Retire the shards of finished threads, while holding the lock."""
+        alive: list[tuple[threading.Thread, _CounterShard]] = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = alive
+        self._compact_at = 2 * len(alive)
+
+    def record(self, elapsed_ns: int, exc_type: type[BaseException] | None) -> None:
+        try:
+            shard: _CounterShard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard.calls += 1
+        shard.total_ns += elapsed_ns
+        if shard.min_ns is None or elapsed_ns < shard.min_ns:
+            shard.min_ns = elapsed_ns
+        shard.max_ns = max(shard.max_ns, elapsed_ns)
+        if exc_type is not None:
+            shard.failures[exc_type] = shard.failures.get(exc_type, 0) + 1
+
+    def snapshot(self) -> FunctionMetrics:
+        total = _CounterShard()
+        with self._lock:
+            self._compact()
+            total.merge(self._retired)
+            for _, shard in self._shards:
+                total.merge(shard)
+        return FunctionMetrics(
+            calls=total.calls,
+            failures=total.failures,
+            total_time=Timing(nanoseconds=total.total_ns),
+            min_time=Timing(nanoseconds=total.min_ns or 0),
+            max_time=Timing(nanoseconds=total.max_ns),
+        )
+
+
+class MetricsRegistry:
+    """Collect the metrics of the functions decorated with `handle_exceptions`.
+
+    Each function is keyed by its module and qualified name. Every thread
+    records into counters of its own, without taking a lock, and snapshots
+    add them up while calls carry on, so a snapshot taken during a burst of
+    calls may be off by the calls in flight.
+    """
+
+    __slots__ = ("_functions", "_lock")
+
+    def __init__(self) -> None:
+        self._functions: dict[str, _FunctionCounters] = {}
+        self._lock = threading.Lock()
+
+    def counters(self, name: str) -> _FunctionCounters:
+        with self._lock:
+            if name not in self._functions:
+                self._functions[name] = _FunctionCounters()
+            return self._functions[name]
+
+    def snapshot(self) -> dict[str, FunctionMetrics]:
+        with self._lock:
+            functions = list(self._functions.items())
+        return {name: counters.snapshot() for name, counters in functions}
+
+
+class CircuitBreaker:
+    """Stop calling a failing dependency for a while.
+
+    While closed, calls go through and their outcomes are counted over the
+    last `window`. Once at least `min_calls` calls were made and at least
+    `failure_rate` of them failed, the circuit opens and calls are refused
+    for `cooldown`. It then becomes half-open and lets `half_open_calls`
+    probe calls through: if they all succeed, the circuit closes, and if any
+    fails, it opens again. Probes that never report back are given up on
+    after another `cooldown`.
+
+    A breaker can be shared by all the functions that use one dependency.
+    """
+
+    __slots__ = (
+        "_bucket_ns",
+        "_calls",
+        "_cooldown",
+        "_epochs",
+        "_failures",
+        "_lock",
+        "_opened_at",
+        "_probe_successes",
+        "_probes",
+        "_state",
+        "failure_rate",
+        "half_open_calls",
+        "min_calls",
+    )
+
+    def __init__(
+        self,
+        *,
+        failure_rate: float = 0.5,
+        window: Timing = DEFAULT_CIRCUIT_WINDOW,
+        min_calls: int = 20,
+        cooldown: Timing = DEFAULT_CIRCUIT_COOLDOWN,
+        half_open_calls: int = 1,
+    ) -> None:
+        if not 0 < failure_rate <= 1:
+            msg = "failure_rate must be in (0, 1]"
+            raise ValueError(msg)
+        if window <= Timing() or cooldown <= Timing():
+            msg = "window and cooldown must be positive"
+            raise ValueError(msg)
+        if min_calls < 1 or half_open_calls < 1:
+            msg = "min_calls and half_open_calls must be at least 1"
+            raise ValueError(msg)
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.half_open_calls = half_open_calls
+        self._cooldown = cooldown
+        self._bucket_ns = max(window.nanoseconds // CIRCUIT_BUCKETS, 1)
+        self._epochs = [-1] * CIRCUIT_BUCKETS
+        self._calls = [0] * CIRCUIT_BUCKETS
+        self._failures = [0] * CIRCUIT_BUCKETS
+        self._state: CircuitState = "closed"
+        self._opened_at = 0
+        self._probes = self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def _open(self, now: int) -> None:
+        self._state = "open"
+        self._opened_at = now
+        self._epochs = [-1] * CIRCUIT_BUCKETS
+
+    def allow(self) -> bool:
+        """Return whether a call may go through, counting it as a probe."""
+        return self._state == "closed" or self._allow_probe()
+
+    def _allow_probe(self) -> bool:
+        now = time.monotonic_ns()
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if now - self._opened_at >= self._cooldown.nanoseconds:
+                # the cooldown is over, or the probes never reported back
+                self._state = "half_open"
+                self._opened_at = now
+                self._probes = self._probe_successes = 0
+            if self._state == "open" or self._probes >= self.half_open_calls:
+                return False
+            self._probes += 1
+            return True
+
+    def record(self, *, failed: bool) -> None:
+        """Count the outcome of a call that was allowed through."""
+        now = time.monotonic_ns()
+        with self._lock:
+            if self._state == "half_open":
+                self._record_probe(now, failed=failed)
+            elif self._state == "closed":
+                self._record_call(now, failed=failed)
+
+    def _record_probe(self, now: int, *, failed: bool) -> None:
+        if failed:
+            self._open(now)
+            logger.warning(CIRCUIT_REOPENED, self._cooldown)
+            return
+        self._probe_successes += 1
+        if self._probe_successes >= self.half_open_calls:
+            self._state = "closed"
+            logger.info(CIRCUIT_CLOSED, self._probe_successes)
+
+    def _record_call(self, now: int, *, failed: bool) -> None:
+        epoch = now // self._bucket_ns
+        index = epoch % CIRCUIT_BUCKETS
+        if self._epochs[index] != epoch:
+            self._epochs[index] = epoch
+            self._calls[index] = self._failures[index] = 0
+        self._calls[index] += 1
+        self._failures[index] += failed
+        if not failed:
+            return
+        oldest = epoch - CIRCUIT_BUCKETS
+        calls = failures = 0
+        for bucket_epoch, bucket_calls, bucket_failures in zip(
+            self._epochs, self._calls, self._failures, strict=True
+        ):
+            if bucket_epoch > oldest:
+                calls += bucket_calls
+                failures += bucket_failures
+        if calls >= self.min_calls and failures >= self.failure_rate * calls:
+            self._open(now)
+            logger.warning(CIRCUIT_OPENED, failures, calls, self._cooldown)
+
+
+class _ExceptionDecorator(Protocol[R_co]):
+    @overload
+    def __call__(
+        self, func: Callable[P, AsyncGenerator[_T, _S]], /
+    ) -> Callable[P, AsyncGenerator[_T, _S]]: ...
+
+    @overload
+    def __call__(
+        self, func: Callable[P, Coroutine[object, object, _T]], /
+    ) -> Callable[P, Coroutine[object, object, _T | R_co | None]]: ...
+
+    @overload
+    def __call__(self, func: Callable[P, _T], /) -> Callable[P, _T | R_co | None]: ...
+
+
 def handle_exceptions(
     *,
     exceptions: tuple[type[Exception], ...] = (Exception,),
     default: R_co | None = None,
     log_level: LogLevel = "info",
     log_args: bool = True,
-) -> Callable[[Callable[P, R_co]], Callable[P, R_co | None]]:
-    log = getattr(logger, _validate_log_level(log_level))
+    log_first: int = 0,
+    log_every: int = 1,
+    summary_interval: Timing | None = None,
+    max_arg_length: int | None = None,
+    metrics: MetricsRegistry | None = None,
+    circuit_breaker: CircuitBreaker | None = None,
+) -> _ExceptionDecorator[R_co]:
+    """Log the listed exceptions of a function and return `default` instead.
 
-    def decorator(func: Callable[P, R_co]) -> Callable[P, R_co | None]:
-        @wraps(func)
-        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R_co | None:
-            try:
-                return func(*args, **kwargs)
-            except exceptions as exc:
-                log_values = (
-                    (
-                        INGEST_ERROR,
-                        func.__name__,  # ty: ignore[unresolved-attribute]
-                        exc.__class__.__name__,
-                        args,
-                        kwargs,
-                    )
-                    if log_args
-                    else (
-                        INGEST_ERROR_WITHOUT_ARGS,
-                        func.__name__,  # ty: ignore[unresolved-attribute]
-                        exc.__class__.__name__,
-                    )
+    Coroutine functions are wrapped in coroutine functions that await them,
+    and async generator functions in async generator functions that stop
+    at a handled exception, without returning `default`.
+
+    During an exception storm, `log_every` logs only one in every so many
+    failures of each exception class, after the first `log_first`, and the
+    first failure of a class is always logged. With a `summary_interval`, the
+    skipped failures are reported as periodic summary records with counts,
+    emitted by the next failure once the interval has passed; failures
+    skipped after the last summary are never reported. `max_arg_length` caps
+    the length of the rendered arguments.
+
+    With a `metrics` registry, every call is counted and timed, along with
+    the exceptions it raises, handled or not. The time of an async generator
+    runs from its first item until it is exhausted or closed.
+
+    With a `circuit_breaker`, every exception counts as a failure, and while
+    the circuit is open, calls return `default` at once without calling the
+    function, or stop at once for async generators.
+    """
+    level = _validate_log_level(log_level)
+    _validate_sampling(log_first, log_every, summary_interval, max_arg_length)
+    log = getattr(logger, level)
+    level_number = _LOG_LEVEL_NUMBERS[level]
+    render: Callable[[object], object] | None = None
+    if max_arg_length is not None:
+        arg_repr = reprlib.Repr()
+        arg_repr.maxstring = arg_repr.maxother = max_arg_length
+        render = partial(_LazyRepr, repr_=arg_repr, limit=max_arg_length)
+
+    def decorator(func: Callable[P, object]) -> Callable[P, object]:
+        name = func.__name__  # ty: ignore[unresolved-attribute]
+        sampler = (
+            None
+            if log_every == 1
+            else _FailureSampler(log_first, log_every, summary_interval)
+        )
+
+        def log_failure(exc: Exception, args: object, kwargs: object) -> None:
+            if not logger.isEnabledFor(level_number):
+                return
+            if sampler is not None:
+                sampled = sampler.sample(exc.__class__)
+                if (summary := sampler.summaries()) is not None:
+                    elapsed, suppressed = summary
+                    for exc_type, count in suppressed.items():
+                        log(INGEST_SUMMARY, name, exc_type.__name__, count, elapsed)
+                if not sampled:
+                    return
+            if not log_args:
+                log(
+                    INGEST_ERROR_WITHOUT_ARGS,
+                    name,
+                    exc.__class__.__name__,
+                    exc_info=exc,
                 )
-                log(*log_values, exc_info=True)
+                return
+            if render is not None:
+                args, kwargs = render(args), render(kwargs)
+            log(INGEST_ERROR, name, exc.__class__.__name__, args, kwargs, exc_info=exc)
+
+        counters = (
+            None
+            if metrics is None
+            else metrics.counters(
+                f"{func.__module__}.{func.__qualname__}"  # ty: ignore[unresolved-attribute]
+            )
+        )
+
+        def succeeded(start: int) -> None:
+            if counters is not None:
+                counters.record(time.perf_counter_ns() - start, None)
+            if circuit_breaker is not None:
+                circuit_breaker.record(failed=False)
+
+        def failed(exc: Exception, start: int, args: object, kwargs: object) -> bool:
+            """Record and log a failure, and return whether it is handled."""
+            if counters is not None:
+                counters.record(time.perf_counter_ns() - start, exc.__class__)
+            if circuit_breaker is not None:
+                circuit_breaker.record(failed=True)
+            if not isinstance(exc, exceptions):
+                return False
+            log_failure(exc, args, kwargs)
+            return True
+
+        if inspect.isasyncgenfunction(func):
+            generator_function = cast(
+                "Callable[P, AsyncGenerator[object, object]]", func
+            )
+
+            async def async_generator_wrapper(
+                *args: P.args, **kwargs: P.kwargs
+            ) -> AsyncGenerator[object, object]:
+                if circuit_breaker is not None and not circuit_breaker.allow():
+                    return
+                generator = generator_function(*args, **kwargs)
+                start = time.perf_counter_ns() if counters is not None else 0
+                try:
+                    value = await anext(generator)
+                    while True:
+                        try:
+                            sent = yield value
+                        except GeneratorExit:
+                            await generator.aclose()
+                            succeeded(start)
+                            raise
+                        except BaseException as thrown:  # noqa: BLE001
+                            value = await generator.athrow(thrown)
+                        else:
+                            value = await generator.asend(sent)
+                except StopAsyncIteration:
+                    succeeded(start)
+                except Exception as exc:
+                    if not failed(exc, start, args, kwargs):
+                        raise
+
+            return update_wrapper(async_generator_wrapper, func)
+
+        if inspect.iscoroutinefunction(func):
+            coroutine_function = cast("Callable[P, Awaitable[object]]", func)
+
+            async def coroutine_wrapper(*args: P.args, **kwargs: P.kwargs) -> object:
+                if circuit_breaker is not None and not circuit_breaker.allow():
+                    return default
+                start = time.perf_counter_ns() if counters is not None else 0
+                try:
+                    result = await coroutine_function(*args, **kwargs)
+                except Exception as exc:
+                    if failed(exc, start, args, kwargs):
+                        return default
+                    raise
+                succeeded(start)
+                return result
+
+            return update_wrapper(coroutine_wrapper, func)
+
+        @wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> object:
+            if circuit_breaker is not None and not circuit_breaker.allow():
                 return default
+            start = time.perf_counter_ns() if counters is not None else 0
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                if failed(exc, start, args, kwargs):
+                    return default
+                raise
+            succeeded(start)
+            return result
 
         return wrapper
 
+    return cast("_ExceptionDecorator[R_co]", decorator)
+
+
+@dataclass(frozen=True, slots=True)
+class CacheInfo:
+    hits: int
+    misses: int
+    max_size: int | None
+    size: int
+
+
+class _Flight:
+    """A computation of a missing key, which other callers wait for."""
+
+    __slots__ = ("done", "error", "value")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: object = None
+        self.error: BaseException | None = None
+
+
+_KWARGS_MARK = object()
+
+
+class Memoized(Generic[P, _R]):
+    """A function whose results are cached, as returned by `memoize`."""
+
+    __wrapped__: Callable[P, _R]
+
+    def __init__(
+        self, func: Callable[P, _R], max_size: int | None, ttl: Timing | None
+    ) -> None:
+        update_wrapper(self, func)
+        self._func = func
+        self._max_size = max_size
+        self._ttl = None if ttl is None else ttl.nanoseconds
+        self._is_async = inspect.iscoroutinefunction(func)
+        self._entries: OrderedDict[object, tuple[object, int | None]] = OrderedDict()
+        self._flights: dict[object, _Flight] = {}
+        self._futures: dict[object, asyncio.Future[object]] = {}
+        self._hits = self._misses = 0
+        self._lock = threading.Lock()
+
+    @overload
+    def __get__(self, instance: None, owner: type | None = None) -> Self: ...
+    @overload
+    def __get__(
+        self: Memoized[Concatenate[_T, _P], _R],
+        instance: _T,
+        owner: type | None = None,
+    ) -> Memoized[_P, _R]: ...
+    def __get__(self, instance: object, owner: type | None = None) -> object:
+        if instance is None:
+            return self
+        return MethodType(self, instance)
+
+    def __call__(self, *args: P.args, **kwargs: P.kwargs) -> _R:
+        key = args if not kwargs else (*args, _KWARGS_MARK, *kwargs.items())
+        compute = partial(self._func, *args, **kwargs)
+        if self._is_async:
+            return cast(
+                "_R",
+                self._call_async(key, cast("Callable[[], Awaitable[object]]", compute)),
+            )
+        return cast("_R", self._call(key, compute))
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                hits=self._hits,
+                misses=self._misses,
+                max_size=self._max_size,
+                size=len(self._entries),
+            )
+
+    def cache_clear(self) -> None:
+        """Drop every cached result and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = 0
+
+    def _cached(self, key: object, now: int) -> tuple[bool, object]:
+        """Look up a fresh result, while holding the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires = entry
+        if expires is not None and now >= expires:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return True, value
+
+    def _store(self, key: object, value: object) -> None:
+        """Cache a result, while holding the lock."""
+        expires = None if self._ttl is None else time.monotonic_ns() + self._ttl
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        if self._max_size is not None and len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def _call(self, key: object, compute: Callable[[], object]) -> object:
+        with self._lock:
+            found, value = self._cached(key, time.monotonic_ns())
+            if found:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        else:
+            with self._lock:
+                self._store(key, flight.value)
+            return flight.value
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def _call_async(
+        self, key: object, compute: Callable[[], Awaitable[object]]
+    ) -> object:
+        while True:
+            with self._lock:
+                found, value = self._cached(key, time.monotonic_ns())
+                if found:
+                    return value
+                future = self._futures.get(key)
+                if future is None:
+                    future = self._futures[key] = (
+                        asyncio.get_running_loop().create_future()
+                    )
+                    self._misses += 1
+                    break
+                self._hits += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the caller computing the result was cancelled; try again
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # nobody may be waiting to retrieve it
+            raise
+        else:
+            with self._lock:
+                self._store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+
+def memoize(
+    *, max_size: int | None = 128, ttl: Timing | None = None
+) -> Callable[[Callable[P, _R]], Memoized[P, _R]]:
+    """Cache the results of a function, like `functools.lru_cache`.
+
+    At most `max_size` results are kept, evicting the least recently used
+    first, and each for at most `ttl`. Concurrent calls with the same
+    arguments wait for a single computation instead of each computing the
+    result, whether they come from several threads or, for coroutine
+    functions, several tasks. Exceptions are not cached.
+    """
+    if max_size is not None and max_size < 1:
+        msg = "max_size must be at least 1"
+        raise ValueError(msg)
+    if ttl is not None and ttl <= Timing():
+        msg = "ttl must be positive"
+        raise ValueError(msg)
+
+    def decorator(func: Callable[P, _R]) -> Memoized[P, _R]:
+        if inspect.isasyncgenfunction(func):
+            msg = "Async generator functions cannot be memoized"
+            raise TypeError(msg)
+        return Memoized(func, max_size, ttl)
+
     return decorator
 
 
-def hash_file(path: Path, buffer_size: int = 2**16) -> str:
-    if buffer_size < 1:
+class HashCache:
+    """Persistent cache of file digests, keyed on file metadata.
+
+    Entries are keyed on the device, inode, size, and modification time of a
+    file, so an unchanged file can be recognised with a single `stat`. The
+    cache is stored in SQLite, holds at most `max_entries` digests, and
+    evicts the least recently used ones first.
+
+    A cache can be shared between threads; it is closed by `close` or by
+    using it as a context manager.
+    """
+
+    __slots__ = ("_connection", "_lock", "_size", "max_entries")
+
+    def __init__(
+        self, path: str | Path = ":memory:", *, max_entries: int = DEFAULT_CACHE_SIZE
+    ) -> None:
+        if max_entries < 1:
+            msg = "max_entries must be at least 1"
+            raise ValueError(msg)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS digests (
+                device INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                algorithm TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (device, inode, algorithm)
+            );
+            CREATE INDEX IF NOT EXISTS digests_last_used ON digests (last_used);
+            """
+        )
+        self._size = self._count()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def _count(self) -> int:
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM digests").fetchone()
+        return cast("int", count)
+
+    def get(self, file_stat: os.stat_result, algorithm: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT digest FROM digests WHERE device = ? AND inode = ? "
+                "AND algorithm = ? AND size = ? AND mtime_ns = ?",
+                (
+                    file_stat.st_dev,
+                    file_stat.st_ino,
+                    algorithm,
+                    file_stat.st_size,
+                    file_stat.st_mtime_ns,
+                ),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE digests SET last_used = ? "
+                "WHERE device = ? AND inode = ? AND algorithm = ?",
+                (time.time_ns(), file_stat.st_dev, file_stat.st_ino, algorithm),
+            )
+        return cast("str", row[0])
+
+    def set(self, file_stat: os.stat_result, algorithm: str, digest: str) -> None:
+        now = time.time_ns()
+        if now - file_stat.st_mtime_ns < RACY_WINDOW_NS:
+            return
+        key = (file_stat.st_dev, file_stat.st_ino, algorithm)
+        values = (file_stat.st_size, file_stat.st_mtime_ns, digest, now)
+        with self._lock:
+            inserted = self._connection.execute(
+                "INSERT INTO digests VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (device, inode, algorithm) DO NOTHING",
+                key + values,
+            ).rowcount
+            if not inserted:
+                self._connection.execute(
+                    "UPDATE digests SET size = ?, mtime_ns = ?, digest = ?, "
+                    "last_used = ? WHERE device = ? AND inode = ? AND algorithm = ?",
+                    values + key,
+                )
+                return
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+
+    def _evict(self, excess: int) -> None:
+        # walks the `last_used` index from the oldest entry, so that evicting
+        # one row costs the same however large the cache is
+        self._size -= self._connection.execute(
+            "DELETE FROM digests WHERE rowid IN (SELECT rowid FROM digests "
+            "ORDER BY last_used, rowid LIMIT ?)",
+            (excess,),
+        ).rowcount
+
+    def invalidate(self, path: Path) -> None:
+        """Forget every digest of a file."""
+        file_stat = path.stat()
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM digests WHERE device = ? AND inode = ?",
+                (file_stat.st_dev, file_stat.st_ino),
+            )
+            self._size = self._count()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM digests")
+            self._size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def _validate_buffer_size(buffer_size: int | None) -> None:
+    if buffer_size is not None and buffer_size < 1:
         msg = "buffer_size must be at least 1"
         raise ValueError(msg)
 
-    sha256 = hashlib.sha256()
+
+def _validate_engine(engine: object) -> HashEngine:
+    if not isinstance(engine, str) or engine not in HASH_ENGINES:
+        supported = ", ".join(sorted(HASH_ENGINES))
+        msg = f"Unsupported hash engine {engine!r}; expected one of: {supported}"
+        raise ValueError(msg)
+    return cast("HashEngine", engine)
+
+
+def _new_hasher(algorithm: str) -> _Hasher:
+    hasher = hashlib.new(algorithm)
+    if hasher.digest_size == 0:
+        msg = f"Variable-length algorithm {algorithm!r} is not supported"
+        raise ValueError(msg)
+    return hasher
+
+
+def _resolve_workers(workers: int | None) -> int:
+    if workers is None:
+        return min(32, (os.cpu_count() or 1) + 4)
+    if workers < 1:
+        msg = "workers must be at least 1"
+        raise ValueError(msg)
+    return workers
+
+
+def _bounded_map(
+    func: Callable[[_T], _R], items: Iterable[_T], workers: int, *, ordered: bool
+) -> Iterator[tuple[_T, Future[_R]]]:
+    """Run `func` over `items` on a thread pool, yielding finished futures.
+
+    At most twice as many items as workers are in flight at any time, so
+    `items` can be an arbitrarily long (or lazy) iterable.
+    """
+    iterator = iter(items)
+    pending: dict[Future[_R], _T] = {}
+    order: deque[Future[_R]] = deque()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pyutilkit")
+
+    def submit(count: int) -> None:
+        for item in islice(iterator, count):
+            future = executor.submit(func, item)
+            pending[future] = item
+            order.append(future)
+
+    try:
+        submit(2 * workers)
+        while pending:
+            if ordered:
+                done = [order.popleft()]
+                wait(done)
+            else:
+                done = list(wait(pending, return_when=FIRST_COMPLETED).done)
+            for future in done:
+                item = pending.pop(future)
+                submit(1)
+                yield item, future
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _auto_buffer_size(file_stat: os.stat_result) -> int:
+    """Pick a buffer size from the preferred block size and the file size.
+
+    The buffer is the smallest multiple of the block size that holds the
+    whole file, capped at `MAX_AUTO_BUFFER_SIZE`.
+    """
+    block_size = getattr(file_stat, "st_blksize", 0) or DEFAULT_BUFFER_SIZE
+    size = min(max(file_stat.st_size, 1), MAX_AUTO_BUFFER_SIZE)
+    return max(block_size, size + -size % block_size)
+
+
+def _feed_read(f: _Readable, hasher: _Updatable, buffer_size: int) -> None:
+    while data := f.read(buffer_size):
+        hasher.update(data)
+
+
+def _feed_readinto(f: _ReadableInto, hasher: _Updatable, buffer_size: int) -> None:
+    buffer = bytearray(buffer_size)
+    with memoryview(buffer) as view:
+        while size := f.readinto(buffer):
+            hasher.update(view[:size])
+
+
+def _feed_mmap(
+    f: _ReadableFile, hasher: _Updatable, buffer_size: int, file_stat: os.stat_result
+) -> None:
+    if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size == 0:
+        # devices, pipes and empty files cannot be mapped
+        _feed_readinto(f, hasher, buffer_size)
+        return
+
+    with (
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped,
+        memoryview(mapped) as view,
+    ):
+        for offset in range(0, len(view), buffer_size):
+            hasher.update(view[offset : offset + buffer_size])
+
+
+def _feed_file(
+    f: _ReadableFile,
+    hasher: _Updatable,
+    buffer_size: int | None,
+    engine: HashEngine,
+    file_stat: os.stat_result,
+) -> None:
+    if buffer_size is None:
+        buffer_size = (
+            _auto_buffer_size(file_stat) if engine == "auto" else DEFAULT_BUFFER_SIZE
+        )
+    if engine == "read":
+        _feed_read(f, hasher, buffer_size)
+    elif engine == "mmap":
+        _feed_mmap(f, hasher, buffer_size, file_stat)
+    else:
+        _feed_readinto(f, hasher, buffer_size)
+
+
+def hash_file(
+    path: Path,
+    buffer_size: int | None = None,
+    *,
+    engine: HashEngine = "auto",
+    algorithm: str = DEFAULT_ALGORITHM,
+    cache: HashCache | None = None,
+    progress: Callable[[int, int | None, Timing], None] | None = None,
+    progress_interval: Timing = DEFAULT_PROGRESS_INTERVAL,
+    stats: HashStats | None = None,
+) -> str:
+    """Compute the hex digest of a file, SHA-256 unless told otherwise.
+
+    `engine` selects how the file is read; every engine produces the same
+    digest. When `buffer_size` is omitted, the `auto` engine derives it from
+    the file's block size and length, and the others use 64KiB. With a
+    `cache`, an unchanged file is recognised from its metadata and not read.
+
+    `progress` is called with the bytes hashed so far, the file size (`None`
+    for devices and pipes) and the elapsed time, at most once per
+    `progress_interval` and once more when the file is done. `stats` is
+    filled in with the time spent reading and hashing.
+
+    `hash_file` always returns a single digest; use `hash_file_digests` to
+    compute several algorithms in one pass over the file.
+    """
+    return hash_file_digests(
+        path,
+        (algorithm,),
+        buffer_size,
+        engine=engine,
+        cache=cache,
+        progress=progress,
+        progress_interval=progress_interval,
+        stats=stats,
+    )[algorithm]
+
+
+def hash_file_digests(
+    path: Path,
+    algorithms: Iterable[str],
+    buffer_size: int | None = None,
+    *,
+    engine: HashEngine = "auto",
+    cache: HashCache | None = None,
+    progress: Callable[[int, int | None, Timing], None] | None = None,
+    progress_interval: Timing = DEFAULT_PROGRESS_INTERVAL,
+    stats: HashStats | None = None,
+) -> dict[str, str]:
+    """Compute several digests of a file while reading it only once.
+
+    The result maps each requested algorithm to its hex digest. With a
+    `cache`, only the digests missing from it are computed, and `progress`
+    and `stats` only account for the bytes actually read.
+    """
+    engine = _validate_engine(engine)
+    _validate_buffer_size(buffer_size)
+    if progress_interval.nanoseconds < 0:
+        msg = "progress_interval must not be negative"
+        raise ValueError(msg)
+
+    hashers = {algorithm: _new_hasher(algorithm) for algorithm in algorithms}
+    if not hashers:
+        msg = "At least one algorithm is required"
+        raise ValueError(msg)
+
+    stopwatch = Stopwatch()
+    with stopwatch, path.open("rb", buffering=0) as f:
+        file_stat = os.fstat(f.fileno())
+        if not stat.S_ISREG(file_stat.st_mode):
+            # the metadata of devices and pipes does not change with their data
+            cache = None
+        digests: dict[str, str] = {}
+        if cache is not None:
+            for algorithm in hashers:
+                if (digest := cache.get(file_stat, algorithm)) is not None:
+                    digests[algorithm] = digest
+        missing = {
+            algorithm: hasher
+            for algorithm, hasher in hashers.items()
+            if algorithm not in digests
+        }
+        instrumentation = None
+        if missing and progress is None and stats is None:
+            _feed_file(
+                f, _MultiHasher(missing.values()), buffer_size, engine, file_stat
+            )
+        elif missing:
+            total = file_stat.st_size if stat.S_ISREG(file_stat.st_mode) else None
+            instrumentation = _Instrumentation(total, progress, progress_interval)
+            _feed_file(
+                _InstrumentedFile(f, instrumentation),
+                _InstrumentedHasher(_MultiHasher(missing.values()), instrumentation),
+                buffer_size,
+                engine,
+                file_stat,
+            )
+            instrumentation.finish()
+
+    if stats is not None:
+        stats.elapsed = stopwatch.elapsed
+        if instrumentation is None:
+            stats.bytes_read = 0
+            stats.read_time = stats.update_time = Timing()
+        else:
+            stats.bytes_read = instrumentation.bytes_done
+            stats.read_time = Timing(nanoseconds=instrumentation.read_ns)
+            stats.update_time = Timing(nanoseconds=instrumentation.update_ns)
+
+    for algorithm, hasher in missing.items():
+        digests[algorithm] = hasher.hexdigest()
+        if cache is not None:
+            cache.set(file_stat, algorithm, digests[algorithm])
+
+    return {algorithm: digests[algorithm] for algorithm in hashers}
+
+
+def _hash_files(
+    paths: Iterable[Path],
+    workers: int,
+    buffer_size: int | None,
+    engine: HashEngine,
+    algorithm: str,
+    cache: HashCache | None,
+    *,
+    ordered: bool,
+) -> Generator[FileHash, None, None]:
+    hash_path = partial(
+        hash_file,
+        buffer_size=buffer_size,
+        engine=engine,
+        algorithm=algorithm,
+        cache=cache,
+    )
+    for path, future in _bounded_map(hash_path, paths, workers, ordered=ordered):
+        try:
+            digest = future.result()
+        except OSError as exc:
+            yield FileHash(path=path, error=exc)
+        else:
+            yield FileHash(path=path, digest=digest)
+
+
+def hash_files(
+    paths: Iterable[Path],
+    *,
+    workers: int | None = None,
+    buffer_size: int | None = None,
+    engine: HashEngine = "auto",
+    algorithm: str = DEFAULT_ALGORITHM,
+    cache: HashCache | None = None,
+    ordered: bool = False,
+) -> Generator[FileHash, None, None]:
+    """Hash many files concurrently on a bounded thread pool.
+
+    Results are yielded as they complete, or in input order if `ordered`
+    is set. A file that cannot be read is reported through `FileHash.error`
+    instead of aborting the whole batch.
+    """
+    engine = _validate_engine(engine)
+    _validate_buffer_size(buffer_size)
+    _new_hasher(algorithm)
+    return _hash_files(
+        paths,
+        _resolve_workers(workers),
+        buffer_size,
+        engine,
+        algorithm,
+        cache,
+        ordered=ordered,
+    )
+
+
+# the files of a directory, and its subdirectories with their device and inode
+# when symlinks are followed
+_DirectoryListing = tuple[
+    list[os.DirEntry[str]], list[tuple[str, tuple[int, int] | None]]
+]
+
+
+def _compile_patterns(patterns: Iterable[str]) -> Callable[[str], object] | None:
+    """Combine glob patterns into a single matcher for entry names."""
+    translated = [fnmatch.translate(pattern) for pattern in patterns]
+    if not translated:
+        return None
+    return re.compile("|".join(translated)).match
+
+
+def _scan_directory(
+    path: str,
+    include: Callable[[str], object] | None,
+    exclude: Callable[[str], object] | None,
+    *,
+    follow_symlinks: bool,
+) -> _DirectoryListing:
+    files: list[os.DirEntry[str]] = []
+    directories: list[tuple[str, tuple[int, int] | None]] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if exclude is not None and exclude(entry.name):
+                continue
+            if entry.is_dir(follow_symlinks=follow_symlinks):
+                key = None
+                if follow_symlinks:
+                    # followed links can lead back to an ancestor
+                    entry_stat = entry.stat()
+                    key = (entry_stat.st_dev, entry_stat.st_ino)
+                directories.append((entry.path, key))
+            elif include is None or include(entry.name):
+                files.append(entry)
+    return files, directories
+
+
+def _scan_tree(
+    root: Path,
+    workers: int,
+    include: Callable[[str], object] | None,
+    exclude: Callable[[str], object] | None,
+    onerror: Callable[[OSError], None] | None,
+    *,
+    follow_symlinks: bool,
+) -> Generator[os.DirEntry[str], None, None]:
+    scan = partial(
+        _scan_directory,
+        include=include,
+        exclude=exclude,
+        follow_symlinks=follow_symlinks,
+    )
+    visited: set[tuple[int, int]] = set()
+    if follow_symlinks:
+        try:
+            root_stat = root.stat()
+        except OSError:
+            pass
+        else:
+            visited.add((root_stat.st_dev, root_stat.st_ino))
+    # a stack walks depth first, which keeps the backlog of directories small
+    stack = [os.fspath(root)]
+    pending: set[Future[_DirectoryListing]] = set()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pyutilkit")
+    try:
+        while stack or pending:
+            while stack and len(pending) < 2 * workers:
+                pending.add(executor.submit(scan, stack.pop()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    files, directories = future.result()
+                except OSError as exc:
+                    if onerror is not None:
+                        onerror(exc)
+                    continue
+                for path, key in directories:
+                    if key is None:
+                        stack.append(path)
+                    elif key not in visited:
+                        visited.add(key)
+                        stack.append(path)
+                yield from files
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_tree(
+    root: Path,
+    *,
+    workers: int | None = None,
+    include: Iterable[str] = (),
+    exclude: Iterable[str] = (),
+    follow_symlinks: bool = False,
+    onerror: Callable[[OSError], None] | None = None,
+) -> Generator[os.DirEntry[str], None, None]:
+    """Find the files under `root`, scanning directories concurrently.
+
+    Every entry that is not a directory is yielded as an `os.DirEntry` as
+    soon as its directory has been listed, in no particular order. Its cached
+    type and, on Windows, stat data can be used without further system calls.
+
+    `include` and `exclude` are glob patterns matched against entry names.
+    Only files matching an `include` pattern are yielded, if any are given,
+    and entries matching an `exclude` pattern are skipped, along with
+    everything below them. Directories that cannot be listed are skipped, and
+    reported to `onerror` if it is given, like `os.walk`.
+    """
+    return _scan_tree(
+        root,
+        _resolve_workers(workers),
+        _compile_patterns(include),
+        _compile_patterns(exclude),
+        onerror,
+        follow_symlinks=follow_symlinks,
+    )
+
+
+def _reusable_node(
+    previous: MerkleTree | None, key: str, file_stat: os.stat_result
+) -> MerkleNode | None:
+    if previous is None:
+        return None
+    node = previous.nodes.get(key)
+    if (
+        node is None
+        or node.kind != "file"
+        or not node.matches(file_stat)
+        or previous.timestamp_ns - node.mtime_ns < RACY_WINDOW_NS
+    ):
+        return None
+    return node
+
+
+def hash_tree(
+    root: Path,
+    previous: MerkleTree | None = None,
+    *,
+    algorithm: str = DEFAULT_ALGORITHM,
+    workers: int | None = None,
+    buffer_size: int | None = None,
+    engine: HashEngine = "auto",
+) -> MerkleTree:
+    """Build a Merkle tree over a directory.
+
+    A file's digest is its `hash_file` digest and a symlink's is the digest of
+    its target path. A directory's digest covers, for every entry sorted by
+    name, the entry kind, a space, the name, a NUL byte, and the entry's raw
+    digest. Other file types are skipped and symlinks are never followed.
+
+    Files whose metadata are unchanged since `previous` are not read again;
+    only the files that changed are hashed, concurrently.
+    """
+    engine = _validate_engine(engine)
+    _validate_buffer_size(buffer_size)
+    _new_hasher(algorithm)
+    if previous is not None and previous.algorithm != algorithm:
+        msg = f"Cannot reuse a {previous.algorithm!r} tree to build a {algorithm!r} one"
+        raise ValueError(msg)
+
+    timestamp_ns = time.time_ns()
+    nodes: dict[str, MerkleNode] = {}
+    children: dict[str, list[tuple[bytes, str]]] = {}
+    directories: list[tuple[str, os.stat_result]] = [(".", root.stat())]
+    pending: list[tuple[str, os.stat_result]] = []
+
+    # `directories` grows while it is walked, so the walk is breadth first
+    for key, _ in directories:
+        entries = children[key] = []
+        with os.scandir(root.joinpath(key)) as iterator:
+            for entry in iterator:
+                child_key = entry.name if key == "." else f"{key}/{entry.name}"
+                entry_stat = entry.stat(follow_symlinks=False)
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append((child_key, entry_stat))
+                elif entry.is_symlink():
+                    target = os.fsencode(root.joinpath(child_key).readlink())
+                    digest = hashlib.new(algorithm, target).hexdigest()
+                    nodes[child_key] = MerkleNode.from_stat(
+                        "symlink", digest, entry_stat
+                    )
+                elif entry.is_file(follow_symlinks=False):
+                    node = _reusable_node(previous, child_key, entry_stat)
+                    if node is None:
+                        pending.append((child_key, entry_stat))
+                    else:
+                        nodes[child_key] = node
+                else:
+                    continue
+                entries.append((os.fsencode(entry.name), child_key))
+
+    def hash_entry(item: tuple[str, os.stat_result]) -> str:
+        return hash_file(
+            root.joinpath(item[0]),
+            buffer_size,
+            engine=engine,
+            algorithm=algorithm,
+        )
+
+    for (key, file_stat), future in _bounded_map(
+        hash_entry, pending, _resolve_workers(workers), ordered=False
+    ):
+        nodes[key] = MerkleNode.from_stat("file", future.result(), file_stat)
+
+    for key, directory_stat in reversed(directories):
+        hasher = _new_hasher(algorithm)
+        for name, child_key in sorted(children[key]):
+            node = nodes[child_key]
+            hasher.update(b"%s %s\0" % (node.kind.encode(), name))
+            hasher.update(bytes.fromhex(node.digest))
+        nodes[key] = MerkleNode.from_stat(
+            "directory", hasher.hexdigest(), directory_stat
+        )
+
+    return MerkleTree(
+        root=root, algorithm=algorithm, nodes=nodes, timestamp_ns=timestamp_ns
+    )
+
+
+def _read_at(f: FileIO, view: memoryview, offset: int, lock: threading.Lock) -> int:
+    if hasattr(os, "preadv"):
+        return os.preadv(f.fileno(), [view], offset)
+    with lock:
+        f.seek(offset)
+        return f.readinto(view) or 0
+
+
+def _hash_chunk(
+    f: FileIO,
+    offset: int,
+    length: int,
+    algorithm: str,
+    buffer_size: int,
+    lock: threading.Lock,
+) -> bytes:
+    hasher = _new_hasher(algorithm)
+    buffer = bytearray(min(buffer_size, length))
+    with memoryview(buffer) as view:
+        while length > 0:
+            size = _read_at(f, view[: min(length, buffer_size)], offset, lock)
+            if size == 0:
+                break
+            hasher.update(view[:size])
+            offset += size
+            length -= size
+    return hasher.digest()
+
+
+def hash_file_chunked(
+    path: Path,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    *,
+    algorithm: str = DEFAULT_ALGORITHM,
+    workers: int | None = None,
+    buffer_size: int | None = None,
+) -> str:
+    r"""Compute the chunked digest of a file, hashing its chunks in parallel.
+
+    This is not a plain digest of the file. The file is split into
+    `chunk_size` byte chunks, each chunk is hashed on its own, and the result
+    is the digest of the header `f"chunked-{algorithm} {chunk_size}\n"`
+    followed by the raw digest of every chunk, in order. The same chunk size
+    and algorithm always produce the same digest, whatever the number of
+    workers.
+    """
+    if chunk_size < 1:
+        msg = "chunk_size must be at least 1"
+        raise ValueError(msg)
+    _validate_buffer_size(buffer_size)
+    hasher = _new_hasher(algorithm)
+    hasher.update(f"chunked-{algorithm} {chunk_size}\n".encode())
+    lock = threading.Lock()
+
+    with path.open("rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        offsets = range(0, size, chunk_size)
+
+        def hash_chunk(offset: int) -> bytes:
+            return _hash_chunk(
+                f,
+                offset,
+                min(chunk_size, size - offset),
+                algorithm,
+                buffer_size or DEFAULT_BUFFER_SIZE,
+                lock,
+            )
+
+        for _, future in _bounded_map(
+            hash_chunk, offsets, _resolve_workers(workers), ordered=True
+        ):
+            hasher.update(future.result())
+
+    return hasher.hexdigest()
+
+
+def _gear_mask(bits: int) -> int:
+    bits = max(bits, 1)
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+def _find_cut_point(
+    data: bytearray, start: int, stop: int, fingerprint: int, mask: int
+) -> tuple[int, int, bool]:
+    """Roll the gear hash over `data[start:stop]` until it matches `mask`.
+
+    Return the position after the last byte consumed, the updated
+    fingerprint, and whether a cut point was found.
+    """
+    gear = _GEAR
+    gear_mask = _GEAR_MASK
+    index = start
+    # iterating over a copy of the slice is faster than indexing every byte
+    for byte in data[start:stop]:
+        fingerprint = ((fingerprint << 1) + gear[byte]) & gear_mask
+        index += 1
+        if not fingerprint & mask:
+            return index, fingerprint, True
+    return stop, fingerprint, False
+
+
+def _chunk_file(
+    path: Path,
+    min_size: int,
+    avg_size: int,
+    max_size: int,
+    algorithm: str,
+    buffer_size: int,
+) -> Generator[Chunk, None, None]:
+    bits = avg_size.bit_length() - 1
+    small_mask = _gear_mask(bits + 2)
+    large_mask = _gear_mask(bits - 2)
+    buffer = bytearray(buffer_size)
+    offset = length = fingerprint = 0
+    hasher = _new_hasher(algorithm)
+
+    with path.open("rb", buffering=0) as f, memoryview(buffer) as view:
+        while size := f.readinto(buffer):
+            position = 0
+            while position < size:
+                found = False
+                if length < min_size:
+                    stop = min(size, position + min_size - length)
+                elif length < avg_size:
+                    stop = min(size, position + avg_size - length)
+                    stop, fingerprint, found = _find_cut_point(
+                        buffer, position, stop, fingerprint, small_mask
+                    )
+                else:
+                    stop = min(size, position + max_size - length)
+                    stop, fingerprint, found = _find_cut_point(
+                        buffer, position, stop, fingerprint, large_mask
+                    )
+                hasher.update(view[position:stop])
+                length += stop - position
+                position = stop
+                if found or length == max_size:
+                    yield Chunk(offset=offset, length=length, digest=hasher.hexdigest())
+                    offset += length
+                    length = fingerprint = 0
+                    hasher = _new_hasher(algorithm)
+
+    if length:
+        yield Chunk(offset=offset, length=length, digest=hasher.hexdigest())
+
+
+def chunk_file(
+    path: Path,
+    *,
+    min_size: int = DEFAULT_MIN_CHUNK_SIZE,
+    avg_size: int = DEFAULT_AVG_CHUNK_SIZE,
+    max_size: int = DEFAULT_MAX_CHUNK_SIZE,
+    algorithm: str = DEFAULT_ALGORITHM,
+    buffer_size: int | None = None,
+) -> Generator[Chunk, None, None]:
+    """Split a file into content-defined chunks.
+
+    Chunk boundaries are chosen by a FastCDC gear hash over the content, so
+    inserting or removing bytes only changes the chunks around the edit.
+    Every chunk but the last is between `min_size` and `max_size` bytes long,
+    averaging close to `avg_size`. The file is read once, through a single
+    reusable buffer.
+
+    This is a pure-Python reference implementation: the gear hash runs once
+    per byte past `min_size` in every chunk, for a throughput of roughly
+    8 MiB/s with the default sizes.
+    """
+    if not 0 < min_size <= avg_size <= max_size:
+        msg = "Chunk sizes must satisfy 0 < min_size <= avg_size <= max_size"
+        raise ValueError(msg)
+    _validate_buffer_size(buffer_size)
+    _new_hasher(algorithm)
+    return _chunk_file(
+        path,
+        min_size,
+        avg_size,
+        max_size,
+        algorithm,
+        buffer_size or DEFAULT_BUFFER_SIZE,
+    )
+
+
+def hash_stream(
+    source: _Readable | ReadableBuffer | Iterable[ReadableBuffer],
+    *,
+    algorithm: str = DEFAULT_ALGORITHM,
+    buffer_size: int | None = None,
+) -> str:
+    """Compute the hex digest of a binary stream, buffer, or iterable of chunks.
+
+    Binary file objects are read until they are exhausted, through a single
+    reusable buffer when they support `readinto`. Buffers such as `bytes` and
+    `memoryview` are hashed in place.
+    """
+    _validate_buffer_size(buffer_size)
+    hasher = _new_hasher(algorithm)
+    buffer_size = buffer_size or DEFAULT_BUFFER_SIZE
+
+    if isinstance(source, _ReadableInto):
+        _feed_readinto(source, hasher, buffer_size)
+    elif isinstance(source, _Readable):
+        _feed_read(source, hasher, buffer_size)
+    else:
+        try:
+            view = memoryview(cast("ReadableBuffer", source))
+        except TypeError:
+            for chunk in cast("Iterable[ReadableBuffer]", source):
+                hasher.update(chunk)
+        else:
+            with view:
+                hasher.update(view)
+
+    return hasher.hexdigest()
+
+
+class HashingReader:
+    """Wrap a binary stream, hashing everything that is read through it."""
+
+    __slots__ = ("_hasher", "_stream", "size")
+
+    def __init__(
+        self, stream: _Readable, *, algorithm: str = DEFAULT_ALGORITHM
+    ) -> None:
+        self._stream = stream
+        self._hasher = _new_hasher(algorithm)
+        self.size = 0
+
+    def read(self, size: int = -1, /) -> bytes:
+        data = self._stream.read(size)
+        self._hasher.update(data)
+        self.size += len(data)
+        return data
+
+    def readinto(self, buffer: WriteableBuffer, /) -> int:
+        with memoryview(buffer) as view, view.cast("B") as byte_view:
+            if isinstance(self._stream, _ReadableInto):
+                size = self._stream.readinto(byte_view) or 0
+            else:
+                data = self._stream.read(len(byte_view))
+                size = len(data)
+                byte_view[:size] = data
+            self._hasher.update(byte_view[:size])
+        self.size += size
+        return size
+
+    def digest(self) -> bytes:
+        return self._hasher.digest()
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
+class HashingWriter:
+    """Wrap a binary stream, hashing everything that is written through it.
+
+    A `write` of the wrapped stream returning `None`, like that of
+    `codecs.StreamWriter`, is taken to have written all the data.
+    """
+
+    __slots__ = ("_hasher", "_stream", "size")
+
+    def __init__(
+        self, stream: _Writable, *, algorithm: str = DEFAULT_ALGORITHM
+    ) -> None:
+        self._stream = stream
+        self._hasher = _new_hasher(algorithm)
+        self.size = 0
+
+    def write(self, data: ReadableBuffer, /) -> int:
+        written = self._stream.write(data)
+        with memoryview(data) as view, view.cast("B") as byte_view:
+            if written is None:
+                written = len(byte_view)
+            self._hasher.update(byte_view[:written])
+        self.size += written
+        return written
+
+    def digest(self) -> bytes:
+        return self._hasher.digest()
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
+def _copy_file_range(src: int, dst: int, count: int) -> int:
+    return os.copy_file_range(src, dst, count)
+
+
+def _sendfile(src: int, dst: int, count: int) -> int:
+    return os.sendfile(dst, src, None, count)
+
+
+def _kernel_copy(src: int, dst: int) -> bool:
+    """Copy the rest of `src` to `dst` without passing through user space.
+
+    Both calls advance the file offsets, so a call that turns out to be
+    unsupported part-way leaves the next one to carry on where it stopped.
+    Returns whether the copy completed.
+    """
+    for name, copy in (
+        ("copy_file_range", _copy_file_range),
+        ("sendfile", _sendfile),
+    ):
+        if not hasattr(os, name):
+            continue
+        try:
+            while copy(src, dst, KERNEL_COPY_SIZE):
+                pass
+        except OSError as error:
+            if error.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+        else:
+            return True
+    return False
+
+
+def _write_all(f: FileIO, data: memoryview) -> None:
+    while data:
+        data = data[f.write(data) :]
+
+
+def copy_file(
+    src: Path,
+    dst: Path,
+    *,
+    algorithm: str | None = None,
+    buffer_size: int | None = None,
+) -> str | None:
+    """Copy the contents of `src` to `dst`, optionally hashing them on the way.
+
+    Without an `algorithm`, the copy is left to the kernel where the platform
+    and file systems allow it, and `None` is returned. With one, the data is
+    copied through a single reusable buffer and hashed as it goes, and the hex
+    digest is returned, so the copy does not need to be read back.
+    """
+    _validate_buffer_size(buffer_size)
+    hasher = None if algorithm is None else _new_hasher(algorithm)
+
+    with src.open("rb", buffering=0) as source:
+        file_stat = os.fstat(source.fileno())
+        try:
+            same_file = os.path.samestat(file_stat, dst.stat())
+        except FileNotFoundError:
+            same_file = False
+        if same_file:
+            msg = f"Cannot copy {src} onto itself"
+            raise ValueError(msg)
+
+        with dst.open("wb", buffering=0) as target:
+            if hasher is None and _kernel_copy(source.fileno(), target.fileno()):
+                return None
+            buffer = bytearray(buffer_size or _auto_buffer_size(file_stat))
+            with memoryview(buffer) as view:
+                while size := source.readinto(buffer):
+                    if hasher is not None:
+                        hasher.update(view[:size])
+                    _write_all(target, view[:size])
+
+    return None if hasher is None else hasher.hexdigest()
+
+
+def _validate_delimiter(delimiter: bytes) -> None:
+    if not delimiter:
+        msg = "delimiter must not be empty"
+        raise ValueError(msg)
+
+
+def _take_records(buffer: bytearray, block: bytes, delimiter: bytes) -> list[bytes]:
+    """Append `block` to `buffer` and remove the complete records from it."""
+    # a delimiter may straddle the previous block and this one
+    position = max(len(buffer) - len(delimiter) + 1, 0)
+    buffer += block
+    records = []
+    start = 0
+    while (index := buffer.find(delimiter, position)) != -1:
+        position = index + len(delimiter)
+        records.append(bytes(buffer[start:position]))
+        start = position
+    del buffer[:start]
+    return records
+
+
+def split_file(path: Path, parts: int, *, delimiter: bytes = b"\n") -> list[FileRange]:
+    """Split a file into about `parts` ranges of similar size.
+
+    Every range but the last ends just after a `delimiter`, so no record is
+    split between two ranges. Only the pages around each boundary are read,
+    so splitting takes about as long for a huge file as for a small one. A
+    file with few delimiters yields fewer ranges, and an empty file none.
+    """
+    if parts < 1:
+        msg = "parts must be at least 1"
+        raise ValueError(msg)
+    _validate_delimiter(delimiter)
 
     with path.open("rb") as f:
-        while data := f.read(buffer_size):
-            sha256.update(data)
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        boundaries = [0]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for part in range(1, parts):
+                target = max(size * part // parts, boundaries[-1])
+                index = mapped.find(delimiter, target)
+                if index == -1:
+                    break
+                boundary = index + len(delimiter)
+                if boundary >= size:
+                    break
+                boundaries.append(boundary)
+        boundaries.append(size)
+
+    return [
+        FileRange(path=path, start=start, end=end, delimiter=delimiter)
+        for start, end in pairwise(boundaries)
+    ]
+
+
+def iter_lines(
+    file_range: FileRange, *, buffer_size: int = DEFAULT_BUFFER_SIZE
+) -> Generator[bytes, None, None]:
+    """Yield the records of a range, each with its trailing delimiter.
+
+    The last record of the file has no delimiter if the file does not end
+    with one. Ranges are independent, so each can be read by a different
+    process.
+    """
+    _validate_buffer_size(buffer_size)
+    _validate_delimiter(file_range.delimiter)
+    delimiter = file_range.delimiter
+    buffer = bytearray()
+    with file_range.path.open("rb") as f:
+        f.seek(file_range.start)
+        remaining = file_range.length
+        while remaining > 0 and (block := f.read(min(buffer_size, remaining))):
+            remaining -= len(block)
+            yield from _take_records(buffer, block, delimiter)
+    if buffer:
+        yield bytes(buffer)
+
+
+class Follower:
+    """Read the lines appended to a file, like `tail -F`, without blocking.
+
+    Each call to `poll` returns the complete lines appended since the last
+    one, reading `buffer_size` bytes at a time and stopping at the first block
+    that completes a line. When the path is rotated to a
+    new file, the rest of the old file is read before switching, and when the
+    file is truncated, reading starts over from the beginning. A file that
+    does not exist yet is picked up once it appears.
+    """
+
+    path: Path
+    delimiter: bytes
+    buffer_size: int
+    __slots__ = (
+        "_buffer",
+        "_file",
+        "_identity",
+        "_position",
+        "buffer_size",
+        "delimiter",
+        "path",
+    )
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        from_start: bool = False,
+        delimiter: bytes = b"\n",
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> None:
+        _validate_delimiter(delimiter)
+        _validate_buffer_size(buffer_size)
+        self.path = path
+        self.delimiter = delimiter
+        self.buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._file: FileIO | None = None
+        self._identity = (0, 0)
+        self._position = 0
+        self._open(at_end=not from_start)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def _open(self, *, at_end: bool) -> None:
+        try:
+            f = self.path.open("rb", buffering=0)
+        except FileNotFoundError:
+            return
+        file_stat = os.fstat(f.fileno())
+        self._file = f
+        self._identity = (file_stat.st_dev, file_stat.st_ino)
+        self._position = f.seek(0, os.SEEK_END) if at_end else 0
+        self._buffer.clear()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _reopen(self, f: FileIO) -> list[bytes]:
+        """Check for rotation or truncation once the end of file is reached."""
+        try:
+            path_stat = self.path.stat()
+        except FileNotFoundError:
+            # rotated away, and the new file has not been created yet
+            return []
+        if (path_stat.st_dev, path_stat.st_ino) != self._identity:
+            lines = []
+            while block := f.read(self.buffer_size):
+                lines.extend(_take_records(self._buffer, block, self.delimiter))
+            if self._buffer:
+                lines.append(bytes(self._buffer))
+            f.close()
+            self._file = None
+            self._open(at_end=False)
+            return lines
+        if path_stat.st_size < self._position:
+            self._position = f.seek(0)
+            self._buffer.clear()
+        return []
+
+    def poll(self) -> list[bytes]:
+        """Return the complete lines appended since the last call."""
+        if self._file is None:
+            self._open(at_end=False)
+            if self._file is None:
+                return []
+        f = self._file
+        while block := f.read(self.buffer_size):
+            self._position += len(block)
+            if lines := _take_records(self._buffer, block, self.delimiter):
+                return lines
+        return self._reopen(f)
+
+
+def _follow(
+    follower: Follower, min_interval: int, max_interval: int
+) -> Generator[bytes, None, None]:
+    with follower:
+        delay = min_interval
+        while True:
+            if lines := follower.poll():
+                delay = min_interval
+                yield from lines
+            else:
+                time.sleep(delay / 1_000_000_000)
+                delay = min(2 * delay, max_interval)
+
+
+def follow(
+    path: Path,
+    *,
+    from_start: bool = False,
+    delimiter: bytes = b"\n",
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    min_interval: Timing = DEFAULT_MIN_POLL_INTERVAL,
+    max_interval: Timing = DEFAULT_MAX_POLL_INTERVAL,
+) -> Generator[bytes, None, None]:
+    """Yield the lines appended to a file as they are written, forever.
+
+    See `Follower` for how rotation and truncation are handled. While the
+    file is idle, the polling interval doubles from `min_interval` up to
+    `max_interval`, and it drops back as soon as a line arrives.
+    """
+    if not Timing() < min_interval <= max_interval:
+        msg = "Poll intervals must satisfy 0 < min_interval <= max_interval"
+        raise ValueError(msg)
+    return _follow(
+        Follower(
+            path,
+            from_start=from_start,
+            delimiter=delimiter,
+            buffer_size=buffer_size,
+        ),
+        min_interval.nanoseconds,
+        max_interval.nanoseconds,
+    )
+
+
+def _sample_digest(path: Path, sample_size: int, algorithm: str) -> str:
+    hasher = _new_hasher(algorithm)
+    with path.open("rb", buffering=0) as f:
+        hasher.update(f.read(sample_size))
+        f.seek(-sample_size, os.SEEK_END)
+        hasher.update(f.read(sample_size))
+    return hasher.hexdigest()
+
+
+def _split_groups(
+    groups: Iterable[list[list[Path]]], digest: Callable[[Path], str], workers: int
+) -> list[list[list[Path]]]:
+    """Split groups of files further by the digest of each file.
+
+    A file is the list of paths that are hard links to it, and only its
+    first path is read. Files that cannot be read are dropped.
+    """
+    items = [(index, links) for index, group in enumerate(groups) for links in group]
+    split: dict[tuple[int, str], list[list[Path]]] = {}
+    for (index, links), future in _bounded_map(
+        lambda item: digest(item[1][0]), items, workers, ordered=True
+    ):
+        try:
+            key = (index, future.result())
+        except OSError:
+            continue
+        split.setdefault(key, []).append(links)
+    return list(split.values())
+
+
+def find_duplicates(
+    paths: Iterable[Path],
+    *,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    algorithm: str = DEFAULT_ALGORITHM,
+    workers: int | None = None,
+    buffer_size: int | None = None,
+) -> list[list[Path]]:
+    """Find groups of files with identical content.
+
+    Files are grouped by size first, then by a digest of their first and last
+    `sample_size` bytes, and only the files that still collide are hashed in
+    full. Hard links to the same file are reported as duplicates without
+    being read. Paths that are not regular files, or that cannot be read,
+    are skipped.
+    """
+    if sample_size < 1:
+        msg = "sample_size must be at least 1"
+        raise ValueError(msg)
+    _validate_buffer_size(buffer_size)
+    _new_hasher(algorithm)
+    workers = _resolve_workers(workers)
+
+    positions: dict[Path, int] = {}
+    sizes: dict[int, dict[tuple[int, int], list[Path]]] = {}
+    for path in paths:
+        if path in positions:
+            continue
+        try:
+            file_stat = path.stat()
+        except OSError:
+            continue
+        if not stat.S_ISREG(file_stat.st_mode):
+            continue
+        positions[path] = len(positions)
+        inodes = sizes.setdefault(file_stat.st_size, {})
+        inodes.setdefault((file_stat.st_dev, file_stat.st_ino), []).append(path)
+
+    resolved: list[list[list[Path]]] = []
+    to_sample: list[list[list[Path]]] = []
+    to_hash: list[list[list[Path]]] = []
+    for size, inodes in sizes.items():
+        group = list(inodes.values())
+        if len(group) == 1:
+            resolved.append(group)
+        elif size <= 2 * sample_size:
+            # sampling would read the whole file anyway
+            to_hash.append(group)
+        else:
+            to_sample.append(group)
+
+    sample_digest = partial(
+        _sample_digest, sample_size=sample_size, algorithm=algorithm
+    )
+    for group in _split_groups(to_sample, sample_digest, workers):
+        (to_hash if len(group) > 1 else resolved).append(group)
+    full_digest = partial(hash_file, buffer_size=buffer_size, algorithm=algorithm)
+    resolved.extend(_split_groups(to_hash, full_digest, workers))
+
+    results = [
+        sorted((path for links in group for path in links), key=positions.__getitem__)
+        for group in resolved
+    ]
+    return sorted(
+        (paths for paths in results if len(paths) > 1),
+        key=lambda paths: positions[paths[0]],
+    )
+
+
+def _parse_manifest_line(line: str, algorithm: str) -> tuple[str, str, str] | None:
+    escaped = line.startswith("\\")
+    if escaped:
+        line = line[1:]
+    if match := _BSD_MANIFEST_LINE.fullmatch(line):
+        algorithm = match["algorithm"].lower().replace("-", "_")
+    elif not (match := _GNU_MANIFEST_LINE.fullmatch(line)):
+        return None
+    name = match["name"]
+    if escaped:
+        name = re.sub(
+            r"\\(.)", lambda escape: _MANIFEST_ESCAPES.get(escape[1], escape[1]), name
+        )
+    return name, algorithm, match["digest"].lower()
+
+
+def _digest_length(algorithm: str) -> int | None:
+    try:
+        return len(_new_hasher(algorithm).hexdigest())
+    except ValueError:
+        return None
+
+
+def _read_manifest(
+    manifest_path: Path, root: Path, algorithm: str, malformed: list[int]
+) -> Generator[tuple[Path, str, str], None, None]:
+    lengths: dict[str, int | None] = {}
+    with manifest_path.open(
+        encoding="utf-8", errors="surrogateescape", newline="\n"
+    ) as f:
+        for number, line in enumerate(f, start=1):
+            text = line.removesuffix("\n").removesuffix("\r")
+            if not text.strip() or text.startswith("#"):
+                continue
+            entry = _parse_manifest_line(text, algorithm)
+            if entry is None:
+                malformed.append(number)
+                continue
+            name, entry_algorithm, digest = entry
+            if entry_algorithm not in lengths:
+                lengths[entry_algorithm] = _digest_length(entry_algorithm)
+            if lengths[entry_algorithm] != len(digest):
+                malformed.append(number)
+                continue
+            yield Path(os.path.normpath(root / name)), entry_algorithm, digest
+
+
+def verify_manifest(
+    manifest_path: Path,
+    root: Path | None = None,
+    *,
+    algorithm: str = DEFAULT_ALGORITHM,
+    workers: int | None = None,
+    fail_fast: bool = False,
+    check_extra: bool = True,
+    buffer_size: int | None = None,
+) -> ManifestReport:
+    """Verify files against a `sha256sum`-style or BSD-style manifest.
+
+    Listed paths are relative to `root`, which defaults to the directory of
+    the manifest. Untagged lines use `algorithm`, while BSD-style lines name
+    their own. The manifest is streamed and the listed files are hashed
+    concurrently; with `fail_fast`, verification stops at the first file
+    that is missing, unreadable, or does not match. With `check_extra`, files
+    under `root` that the manifest does not list are reported as extra.
+    """
+    _validate_buffer_size(buffer_size)
+    _new_hasher(algorithm)
+    workers = _resolve_workers(workers)
+    if root is None:
+        root = manifest_path.parent
+
+    malformed: list[int] = []
+    listed: set[Path] = set()
+    failures: dict[str, list[Path]] = {
+        "missing": [],
+        "mismatched": [],
+        "unreadable": [],
+    }
+    verified = 0
+    complete = True
+
+    def hash_entry(entry: tuple[Path, str, str]) -> str:
+        path, entry_algorithm, _ = entry
+        return hash_file(path, buffer_size, algorithm=entry_algorithm)
+
+    entries = _read_manifest(manifest_path, root, algorithm, malformed)
+    for (path, _, expected), future in _bounded_map(
+        hash_entry, entries, workers, ordered=False
+    ):
+        if check_extra:
+            listed.add(path)
+        try:
+            digest = future.result()
+        except FileNotFoundError:
+            failures["missing"].append(path)
+        except OSError:
+            failures["unreadable"].append(path)
+        else:
+            if digest == expected:
+                verified += 1
+                continue
+            failures["mismatched"].append(path)
+        if fail_fast:
+            complete = False
+            break
+
+    extra: list[Path] = []
+    if check_extra and complete:
+        listed.add(Path(os.path.normpath(manifest_path)))
+        extra.extend(
+            path
+            for path in root.rglob("*")
+            if Path(os.path.normpath(path)) not in listed and path.is_file()
+        )
 
-    return sha256.hexdigest()
+    return ManifestReport(
+        verified=verified,
+        missing=tuple(sorted(failures["missing"])),
+        mismatched=tuple(sorted(failures["mismatched"])),
+        unreadable=tuple(sorted(failures["unreadable"])),
+        extra=tuple(sorted(extra)),
+        malformed=tuple(malformed),
+        complete=complete,
+    )
@@ -1,42 +1,282 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import os
+import selectors
 import sys
-from dataclasses import dataclass
-from queue import SimpleQueue
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import pairwise
+from queue import Queue, SimpleQueue
 from subprocess import PIPE, Popen
-from threading import Thread
-from typing import TYPE_CHECKING, cast
+from threading import Lock, Thread
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Literal, Self, cast
 
 from pyutilkit.timing import Stopwatch, Timing
 
 if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Iterator, Sequence
+    from io import BufferedReader
     from pathlib import Path
+    from types import TracebackType
     from typing import BinaryIO
 
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_PENDING = 16
+
+StreamName = Literal["stdout", "stderr"]
+DrainEngine = Literal["threads", "selector"]
+DRAIN_ENGINES = frozenset({"threads", "selector"})
+# how often exited children are polled for when pidfds are not available
+EXIT_POLL_INTERVAL = 0.001
+
+
+@dataclass(frozen=True, slots=True)
+class Capture:
+    """How much of an output stream to keep.
+
+    By default everything is kept in memory. With a `tail`, only the first
+    `head` and the last `tail` bytes are kept. With `spill_after`, everything
+    is kept, but once it grows past that many bytes it is moved to a
+    temporary file.
+    """
+
+    head: int = 0
+    tail: int | None = None
+    spill_after: int | None = None
+
+
+DEFAULT_CAPTURE = Capture()
+
+
+def _validate_capture(capture: Capture) -> None:
+    sizes = (capture.head, capture.tail, capture.spill_after)
+    if any(size is not None and size < 0 for size in sizes):
+        msg = "Capture sizes cannot be negative"
+        raise ValueError(msg)
+    if capture.head and capture.tail is None:
+        msg = "Capture head requires a tail"
+        raise ValueError(msg)
+    if capture.spill_after is not None and capture.tail is not None:
+        msg = "Capture spill_after cannot be combined with head or tail"
+        raise ValueError(msg)
+
+
+class CapturedOutput:
+    """The part of an output stream kept according to a `Capture`.
+
+    Output spilled to a temporary file stays readable until `close` is called,
+    directly or by using the buffer as a context manager.
+    """
+
+    __slots__ = (
+        "_capture",
+        "_head",
+        "_lock",
+        "_spill",
+        "_tail",
+        "_tail_size",
+        "size",
+    )
+
+    def __init__(self, capture: Capture = DEFAULT_CAPTURE) -> None:
+        _validate_capture(capture)
+        self._capture = capture
+        self._head = bytearray()
+        self._tail: deque[bytes] = deque()
+        self._tail_size = 0
+        self._spill: BinaryIO | None = None
+        # held around every seek and read of the spill file, which is shared
+        self._lock = Lock()
+        self.size = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(size={self.size}, dropped={self.dropped})"
+
+    def __deepcopy__(self, memo: dict[int, object]) -> Self:
+        copy = type(self)(self._capture)
+        for chunk in self.iter_chunks():
+            copy.write(chunk)
+        copy.size = self.size
+        return copy
+
+    @property
+    def dropped(self) -> int:
+        """The number of bytes written but not kept."""
+        if self._spill is not None:
+            return 0
+        return self.size - len(self._head) - self._tail_size
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill is not None
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        capture = self._capture
+        if self._spill is not None:
+            with self._lock:
+                self._spill.write(data)
+        elif capture.spill_after is not None:
+            self._head += data
+            if len(self._head) > capture.spill_after:
+                self._spill = cast("BinaryIO", tempfile.TemporaryFile())  # noqa: SIM115
+                self._spill.write(self._head)
+                self._head = bytearray()
+        elif capture.tail is None:
+            self._head += data
+        else:
+            room = capture.head - len(self._head)
+            if room > 0:
+                self._head += data[:room]
+                data = data[room:]
+            if data and capture.tail:
+                self._tail.append(data)
+                self._tail_size += len(data)
+                self._trim(capture.tail)
+
+    def _trim(self, limit: int) -> None:
+        while self._tail_size > limit:
+            excess = self._tail_size - limit
+            first = self._tail[0]
+            if len(first) <= excess:
+                self._tail.popleft()
+                self._tail_size -= len(first)
+            else:
+                self._tail[0] = first[excess:]
+                self._tail_size -= excess
+
+    def iter_chunks(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Generator[bytes, None, None]:
+        """Yield the kept bytes in order, reading a spilled file in chunks."""
+        if self._spill is None:
+            if self._head:
+                yield bytes(self._head)
+            yield from self._tail
+            return
+        position = 0
+        while True:
+            with self._lock:
+                self._spill.seek(position)
+                chunk = self._spill.read(chunk_size)
+                self._spill.seek(0, os.SEEK_END)
+            if not chunk:
+                return
+            position += len(chunk)
+            yield chunk
+
+    def getvalue(self) -> bytes:
+        """Return the kept bytes, reading them back if they were spilled."""
+        return b"".join(self.iter_chunks())
+
+    def close(self) -> None:
+        """Delete the temporary file of spilled output."""
+        if self._spill is not None:
+            self._spill.close()
+
 
 @dataclass(frozen=True)
 class ProcessOutput:
+    """The result of a finished command.
+
+    `stdout` and `stderr` hold the kept bytes of each stream, and are empty
+    when they were spilled to a temporary file. Unless the default `Capture`
+    was used, `captured_stdout` and `captured_stderr` are the `CapturedOutput`
+    buffers, with the total size of each stream and any spilled data; use the
+    output as a context manager, or call `close`, to delete spilled files.
+    """
+
     stdout: bytes
     stderr: bytes
     pid: int
     returncode: int
     elapsed: Timing
+    command: tuple[str, ...] = ()
+    captured_stdout: CapturedOutput | None = field(
+        default=None, repr=False, compare=False
+    )
+    captured_stderr: CapturedOutput | None = field(
+        default=None, repr=False, compare=False
+    )
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Delete the temporary files of spilled output."""
+        for captured in (self.captured_stdout, self.captured_stderr):
+            if captured is not None:
+                captured.close()
+
+
+def _process_output(
+    command: list[str],
+    pid: int,
+    returncode: int,
+    elapsed: Timing,
+    stdout: CapturedOutput,
+    stderr: CapturedOutput,
+    capture: Capture,
+) -> ProcessOutput:
+    bounded = capture != DEFAULT_CAPTURE
+    return ProcessOutput(
+        stdout=b"" if stdout.spilled else stdout.getvalue(),
+        stderr=b"" if stderr.spilled else stderr.getvalue(),
+        pid=pid,
+        returncode=returncode,
+        elapsed=elapsed,
+        command=tuple(command),
+        captured_stdout=stdout if bounded else None,
+        captured_stderr=stderr if bounded else None,
+    )
+
+
+# held while echoing a line, so that lines of concurrent commands never mix
+_OUTPUT_LOCK = Lock()
 
 
 def _write_output(stream: BinaryIO, line: bytes) -> None:
-    stream.write(line)
-    stream.flush()
+    with _OUTPUT_LOCK:
+        stream.write(line)
+        stream.flush()
 
 
 def _drain_pipe(
     pipe: BinaryIO,
     output: BinaryIO | None,
-    captured: list[bytes],
+    captured: CapturedOutput,
     errors: SimpleQueue[Exception],
 ) -> None:
     echo = output is not None
-    for line in pipe:
-        captured.append(line)
+    # lines are read in bounded pieces, so that memory stays bounded too
+    for line in iter(partial(pipe.readline, DEFAULT_CHUNK_SIZE), b""):
+        captured.write(line)
         if not echo:
             continue
         try:
@@ -46,6 +286,41 @@ def _drain_pipe(
             echo = False
 
 
+async def _drain_stream(
+    reader: asyncio.StreamReader,
+    output: BinaryIO | None,
+    captured: CapturedOutput,
+    errors: list[Exception],
+) -> None:
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as exc:
+            line = exc.partial
+        except asyncio.LimitOverrunError as exc:
+            # a line longer than the stream limit is passed on in pieces
+            line = await reader.readexactly(exc.consumed)
+        if not line:
+            return
+        captured.write(line)
+        if output is None:
+            continue
+        try:
+            _write_output(output, line)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+            output = None
+
+
+def _raise_errors(errors: Sequence[Exception]) -> None:
+    """Raise the first echo error, with the others chained as its causes."""
+    if not errors:
+        return
+    for error, cause in pairwise(errors):
+        error.__cause__ = cause
+    raise errors[0]
+
+
 def _validate_command(command: object) -> list[str]:
     if not isinstance(command, list):
         msg = "command must be a list of argument strings"
@@ -53,15 +328,264 @@ def _validate_command(command: object) -> list[str]:
     return cast("list[str]", command)
 
 
+def _validate_engine(engine: object) -> DrainEngine:
+    if not isinstance(engine, str) or engine not in DRAIN_ENGINES:
+        supported = ", ".join(sorted(DRAIN_ENGINES))
+        msg = f"Unsupported drain engine {engine!r}; expected one of: {supported}"
+        raise ValueError(msg)
+    if sys.platform == "win32":
+        # selectors cannot wait on pipes on Windows
+        return "threads"
+    return cast("DrainEngine", engine)
+
+
+class _Run:
+    """A command whose pipes are drained by a `_SelectorDrain`."""
+
+    __slots__ = (
+        "capture",
+        "command",
+        "elapsed",
+        "errors",
+        "open_pipes",
+        "process",
+        "start",
+        "stderr",
+        "stdout",
+    )
+
+    def __init__(
+        self,
+        command: list[str],
+        cwd: str | Path | None,
+        env: dict[str, str] | None,
+        capture: Capture,
+    ) -> None:
+        self.command = command
+        self.capture = capture
+        self.stdout = CapturedOutput(capture)
+        self.stderr = CapturedOutput(capture)
+        self.errors: list[Exception] = []
+        self.elapsed: Timing | None = None
+        self.start = perf_counter_ns()
+        self.process = Popen(  # noqa: S603
+            command, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env
+        )
+        self.open_pipes = 2
+
+    @property
+    def finished(self) -> bool:
+        return not self.open_pipes and self.elapsed is not None
+
+    def reap(self) -> bool:
+        """Record the elapsed time if the process has exited."""
+        if self.elapsed is None and self.process.poll() is not None:
+            self.elapsed = Timing(nanoseconds=perf_counter_ns() - self.start)
+        return self.elapsed is not None
+
+    def result(self) -> ProcessOutput:
+        _raise_errors(self.errors)
+        return _process_output(
+            self.command,
+            self.process.pid,
+            self.process.returncode,
+            cast("Timing", self.elapsed),
+            self.stdout,
+            self.stderr,
+            self.capture,
+        )
+
+
+class _PipeReader:
+    """Capture and echo the output of a pipe, as the selector reads it."""
+
+    __slots__ = ("captured", "output", "partial", "run")
+
+    def __init__(
+        self, run: _Run, output: BinaryIO | None, captured: CapturedOutput
+    ) -> None:
+        self.run = run
+        self.output = output
+        self.captured = captured
+        self.partial = b""
+
+    def feed(self, data: bytes) -> None:
+        self.captured.write(data)
+        if self.output is None:
+            return
+        # echo complete lines, in pieces of at most a chunk like `readline`
+        buffer = self.partial + data
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start, start + DEFAULT_CHUNK_SIZE)
+            if end != -1:
+                end += 1
+            elif len(buffer) - start >= DEFAULT_CHUNK_SIZE:
+                end = start + DEFAULT_CHUNK_SIZE
+            else:
+                break
+            self._echo(buffer[start:end])
+            start = end
+        self.partial = buffer[start:]
+
+    def close(self) -> None:
+        if self.partial:
+            self._echo(self.partial)
+            self.partial = b""
+
+    def _echo(self, line: bytes) -> None:
+        if self.output is None:
+            return
+        try:
+            _write_output(self.output, line)
+        except Exception as exc:  # noqa: BLE001
+            self.run.errors.append(exc)
+            self.output = None
+
+
+class _SelectorDrain:
+    """Drain the pipes of many commands from the calling thread.
+
+    Where pidfds are available the exit of each child is waited for by the
+    same selector, otherwise exited children are polled for.
+    """
+
+    __slots__ = ("_exiting", "_runs", "_selector")
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        self._runs: set[_Run] = set()
+        self._exiting: set[_Run] = set()
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def add(self, run: _Run) -> None:
+        self._runs.add(run)
+        process = run.process
+        for pipe, output, captured in (
+            (process.stdout, getattr(sys.stdout, "buffer", None), run.stdout),
+            (process.stderr, getattr(sys.stderr, "buffer", None), run.stderr),
+        ):
+            reader = _PipeReader(run, output, captured)
+            self._selector.register(
+                cast("BinaryIO", pipe), selectors.EVENT_READ, reader
+            )
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except (AttributeError, OSError):
+            self._exiting.add(run)
+        else:
+            self._selector.register(pidfd, selectors.EVENT_READ, run)
+
+    def wait(self) -> list[_Run]:
+        """Drain until at least one command has finished, and return them."""
+        finished: list[_Run] = []
+        while not finished:
+            timeout = EXIT_POLL_INTERVAL if self._exiting else None
+            for key, _ in self._selector.select(timeout):
+                if isinstance(key.data, _Run):
+                    self._selector.unregister(key.fd)
+                    os.close(key.fd)
+                    self._exiting.add(key.data)
+                    continue
+                reader = cast("_PipeReader", key.data)
+                data = os.read(key.fd, DEFAULT_CHUNK_SIZE)
+                if data:
+                    reader.feed(data)
+                    continue
+                self._selector.unregister(key.fileobj)
+                cast("BinaryIO", key.fileobj).close()
+                reader.close()
+                reader.run.open_pipes -= 1
+            for run in list(self._exiting):
+                if run.reap() and run.finished:
+                    self._exiting.discard(run)
+                    self._runs.discard(run)
+                    finished.append(run)
+        return finished
+
+    def close(self) -> None:
+        """Kill and reap the commands that have not finished."""
+        for run in self._runs:
+            run.process.kill()
+        for key in list(self._selector.get_map().values()):
+            self._selector.unregister(key.fileobj)
+            if isinstance(key.data, _Run):
+                os.close(key.fd)
+            else:
+                cast("BinaryIO", key.fileobj).close()
+        for run in self._runs:
+            run.process.wait()
+        self._selector.close()
+
+
+def _run_selector(
+    command: list[str],
+    cwd: str | Path | None,
+    env: dict[str, str] | None,
+    capture: Capture,
+) -> ProcessOutput:
+    drain = _SelectorDrain()
+    try:
+        drain.add(_Run(command, cwd, env, capture))
+        (run,) = drain.wait()
+    finally:
+        drain.close()
+    return run.result()
+
+
 def run_command(
     command: list[str],
     cwd: str | Path | None = None,
     env: dict[str, str] | None = None,
+    *,
+    capture: Capture = DEFAULT_CAPTURE,
+    engine: DrainEngine = "threads",
 ) -> ProcessOutput:
     command = _validate_command(command)
+    _validate_capture(capture)
+    if _validate_engine(engine) == "selector":
+        return _run_selector(command, cwd, env, capture)
+    return _run_threads(command, cwd, env, capture)
+
+
+class _ProcessGroup:
+    """The live children of `run_commands`, so that they can be killed at once."""
+
+    __slots__ = ("_killed", "_lock", "_processes")
+
+    def __init__(self) -> None:
+        self._killed = False
+        self._lock = Lock()
+        self._processes: set[Popen[bytes]] = set()
+
+    def add(self, process: Popen[bytes]) -> None:
+        with self._lock:
+            if self._killed:
+                process.kill()
+            self._processes.add(process)
+
+    def discard(self, process: Popen[bytes]) -> None:
+        with self._lock:
+            self._processes.discard(process)
 
-    stdout: list[bytes] = []
-    stderr: list[bytes] = []
+    def kill(self) -> None:
+        with self._lock:
+            self._killed = True
+            for process in self._processes:
+                process.kill()
+
+
+def _run_threads(
+    command: list[str],
+    cwd: str | Path | None,
+    env: dict[str, str] | None,
+    capture: Capture,
+    group: _ProcessGroup | None = None,
+) -> ProcessOutput:
+    stdout = CapturedOutput(capture)
+    stderr = CapturedOutput(capture)
     errors: SimpleQueue[Exception] = SimpleQueue()
     stopwatch = Stopwatch()
     with (
@@ -70,6 +594,8 @@ def run_command(
             command, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env
         ) as process,
     ):
+        if group is not None:
+            group.add(process)
         stdout_pipe = cast("BinaryIO", process.stdout)
         stderr_pipe = cast("BinaryIO", process.stderr)
         readers = (
@@ -90,20 +616,298 @@ def run_command(
         process.wait()
         for reader in readers:
             reader.join()
+        if group is not None:
+            group.discard(process)
 
-    if not errors.empty():
-        error = errors.get()
-        current_error = error
-        while not errors.empty():
-            next_error = errors.get()
-            current_error.__cause__ = next_error
-            current_error = next_error
-        raise error
+    pending: list[Exception] = []
+    while not errors.empty():
+        pending.append(errors.get())
+    _raise_errors(pending)
 
-    return ProcessOutput(
-        stdout=b"".join(stdout),
-        stderr=b"".join(stderr),
+    return _process_output(
+        command,
+        process.pid,
+        process.returncode,
+        stopwatch.elapsed,
+        stdout,
+        stderr,
+        capture,
+    )
+
+
+async def async_run_command(
+    command: list[str],
+    cwd: str | Path | None = None,
+    env: dict[str, str] | None = None,
+    *,
+    capture: Capture = DEFAULT_CAPTURE,
+) -> ProcessOutput:
+    """Run a command like `run_command`, without blocking the event loop.
+
+    Both pipes are drained by the running event loop instead of reader
+    threads. If the awaiting task is cancelled, the child is killed and
+    reaped before the cancellation propagates.
+    """
+    command = _validate_command(command)
+    _validate_capture(capture)
+
+    stdout = CapturedOutput(capture)
+    stderr = CapturedOutput(capture)
+    errors: list[Exception] = []
+    stopwatch = Stopwatch()
+    with stopwatch:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env
+        )
+        try:
+            await asyncio.gather(
+                _drain_stream(
+                    cast("asyncio.StreamReader", process.stdout),
+                    getattr(sys.stdout, "buffer", None),
+                    stdout,
+                    errors,
+                ),
+                _drain_stream(
+                    cast("asyncio.StreamReader", process.stderr),
+                    getattr(sys.stderr, "buffer", None),
+                    stderr,
+                    errors,
+                ),
+            )
+            returncode = await process.wait()
+        except BaseException:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            await process.wait()
+            raise
+
+    _raise_errors(errors)
+
+    return _process_output(
+        command, process.pid, returncode, stopwatch.elapsed, stdout, stderr, capture
+    )
+
+
+def _run_commands(
+    commands: Iterable[list[str]],
+    max_workers: int,
+    cwd: str | Path | None,
+    env: dict[str, str] | None,
+    capture: Capture,
+    *,
+    fail_fast: bool,
+) -> Generator[ProcessOutput, None, None]:
+    remaining = iter(commands)
+    pending: set[Future[ProcessOutput]] = set()
+    stopped = False
+    group = _ProcessGroup()
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="pyutilkit"
+    )
+    try:
+        while True:
+            while not stopped and len(pending) < max_workers:
+                command = next(remaining, None)
+                if command is None:
+                    break
+                command = _validate_command(command)
+                pending.add(
+                    executor.submit(_run_threads, command, cwd, env, capture, group)
+                )
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                output = future.result()
+                stopped |= fail_fast and output.returncode != 0
+                yield output
+    finally:
+        group.kill()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_commands_selector(
+    commands: Iterable[list[str]],
+    max_workers: int,
+    cwd: str | Path | None,
+    env: dict[str, str] | None,
+    capture: Capture,
+    *,
+    fail_fast: bool,
+) -> Generator[ProcessOutput, None, None]:
+    remaining = iter(commands)
+    stopped = False
+    drain = _SelectorDrain()
+    try:
+        while True:
+            while not stopped and len(drain) < max_workers:
+                command = next(remaining, None)
+                if command is None:
+                    break
+                command = _validate_command(command)
+                drain.add(_Run(command, cwd, env, capture))
+            if not drain:
+                return
+            for run in drain.wait():
+                output = run.result()
+                stopped |= fail_fast and output.returncode != 0
+                yield output
+    finally:
+        drain.close()
+
+
+def run_commands(
+    commands: Iterable[list[str]],
+    max_workers: int | None = None,
+    cwd: str | Path | None = None,
+    env: dict[str, str] | None = None,
+    *,
+    fail_fast: bool = False,
+    capture: Capture = DEFAULT_CAPTURE,
+    engine: DrainEngine = "threads",
+) -> Generator[ProcessOutput, None, None]:
+    """Run many commands, at most `max_workers` at a time.
+
+    Outputs are yielded as the commands complete, and `ProcessOutput.command`
+    tells them apart. With `fail_fast`, no new command is started once one
+    exits with a non-zero return code, but those already running finish and
+    are yielded. Echoed output is written a whole line at a time.
+
+    Closing the generator before it is exhausted, or an error while running,
+    kills the commands still running and waits for them to be reaped; with
+    either engine, abandoning the iterator does not wait for them to finish.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers < 1:
+        msg = "max_workers must be at least 1"
+        raise ValueError(msg)
+    _validate_capture(capture)
+    if _validate_engine(engine) == "selector":
+        return _run_commands_selector(
+            commands, max_workers, cwd, env, capture, fail_fast=fail_fast
+        )
+    return _run_commands(commands, max_workers, cwd, env, capture, fail_fast=fail_fast)
+
+
+def _stream_pipe(
+    pipe: BufferedReader,
+    name: StreamName,
+    events: Queue[tuple[StreamName, bytes] | None],
+    chunk_size: int,
+) -> None:
+    try:
+        while chunk := pipe.read1(chunk_size):
+            events.put((name, chunk))
+    finally:
+        events.put(None)
+
+
+class CommandStream:
+    """The output of a command run by `stream_command`, as it arrives.
+
+    Iterating yields `(stream, chunk)` pairs until both pipes are closed.
+    `output` is available once the `stream_command` block exits.
+    """
+
+    __slots__ = ("_events", "_open_pipes", "_output")
+
+    def __init__(self, events: Queue[tuple[StreamName, bytes] | None]) -> None:
+        self._events = events
+        self._open_pipes = 2
+        self._output: ProcessOutput | None = None
+
+    def __iter__(self) -> Iterator[tuple[StreamName, bytes]]:
+        while self._open_pipes:
+            event = self._events.get()
+            if event is None:
+                self._open_pipes -= 1
+            else:
+                yield event
+
+    @property
+    def output(self) -> ProcessOutput:
+        """The result of the command, without the streamed output."""
+        if self._output is None:
+            msg = "The command is still running"
+            raise RuntimeError(msg)
+        return self._output
+
+    def _drain(self) -> None:
+        """Discard the remaining output, so that the readers can finish."""
+        deque(self, maxlen=0)
+
+
+@contextmanager
+def stream_command(
+    command: list[str],
+    cwd: str | Path | None = None,
+    env: dict[str, str] | None = None,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_pending: int = DEFAULT_MAX_PENDING,
+) -> Generator[CommandStream, None, None]:
+    """Run a command and iterate over its output while it runs.
+
+    At most `max_pending` chunks of up to `chunk_size` bytes are buffered;
+    beyond that the child blocks writing to its pipes until they are
+    consumed, so memory use does not grow with the size of the output.
+    Output is neither echoed nor captured. If the block exits before the
+    output is exhausted, the child is killed.
+    """
+    command = _validate_command(command)
+    if chunk_size < 1 or max_pending < 1:
+        msg = "chunk_size and max_pending must be at least 1"
+        raise ValueError(msg)
+
+    events: Queue[tuple[StreamName, bytes] | None] = Queue(maxsize=max_pending)
+    stream = CommandStream(events)
+    stopwatch = Stopwatch()
+    with (
+        stopwatch,
+        Popen(  # noqa: S603
+            command, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env
+        ) as process,
+    ):
+        readers = (
+            Thread(
+                target=_stream_pipe,
+                args=(
+                    cast("BufferedReader", process.stdout),
+                    "stdout",
+                    events,
+                    chunk_size,
+                ),
+                name=f"pyutilkit-stdout-{process.pid}",
+            ),
+            Thread(
+                target=_stream_pipe,
+                args=(
+                    cast("BufferedReader", process.stderr),
+                    "stderr",
+                    events,
+                    chunk_size,
+                ),
+                name=f"pyutilkit-stderr-{process.pid}",
+            ),
+        )
+        for reader in readers:
+            reader.start()
+        try:
+            yield stream
+        finally:
+            if stream._open_pipes:  # noqa: SLF001
+                process.kill()
+                stream._drain()  # noqa: SLF001
+            for reader in readers:
+                reader.join()
+            process.wait()
+
+    stream._output = ProcessOutput(  # noqa: SLF001
+        stdout=b"",
+        stderr=b"",
         pid=process.pid,
         returncode=process.returncode,
         elapsed=stopwatch.elapsed,
+        command=tuple(command),
     )
@@ -1,12 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+import errno
 import hashlib
+import inspect
+import io
+import itertools
 import logging
 import os
+import pickle
+import random
+import re
+import threading
+import time
+from functools import partial
 from pathlib import Path
-from typing import NoReturn, cast
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, NoReturn, cast
+from unittest import mock
 
 import pytest
 
-from pyutilkit.files import LogLevel, handle_exceptions, hash_file
+import pyutilkit.files as files_module
+from pyutilkit.files import (
+    CacheInfo,
+    Chunk,
+    CircuitBreaker,
+    CircuitState,
+    FileRange,
+    Follower,
+    FunctionMetrics,
+    HashCache,
+    HashEngine,
+    HashingReader,
+    HashingWriter,
+    HashStats,
+    LogLevel,
+    ManifestReport,
+    Memoized,
+    MetricsRegistry,
+    chunk_file,
+    copy_file,
+    find_duplicates,
+    follow,
+    handle_exceptions,
+    hash_file,
+    hash_file_chunked,
+    hash_file_digests,
+    hash_files,
+    hash_stream,
+    hash_tree,
+    iter_lines,
+    memoize,
+    scan_tree,
+    split_file,
+    verify_manifest,
+)
+from pyutilkit.timing import Timing
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Iterable, Iterator
+
+    from _typeshed import ReadableBuffer
 
 
 def test_handle_exceptions_handled_exception() -> None:
@@ -68,7 +123,7 @@ def test_handle_exceptions_logs_at_requested_level(
 def test_handle_exceptions_logs_arguments_by_default(
     caplog: pytest.LogCaptureFixture,
 ) -> None:
-    @handle_exceptions(exceptions=(ValueError,))  # type: ignore[arg-type]
+    @handle_exceptions(exceptions=(ValueError,))
     def authenticate(user: str, *, api_key: str) -> None:
         if user and api_key:
             raise ValueError
@@ -83,7 +138,7 @@ def test_handle_exceptions_logs_arguments_by_default(
 def test_handle_exceptions_can_suppress_arguments(
     caplog: pytest.LogCaptureFixture,
 ) -> None:
-    @handle_exceptions(exceptions=(ValueError,), log_args=False)  # type: ignore[arg-type]
+    @handle_exceptions(exceptions=(ValueError,), log_args=False)
     def authenticate(user: str, *, api_key: str) -> None:
         if user and api_key:
             raise ValueError
@@ -98,6 +153,820 @@ def test_handle_exceptions_can_suppress_arguments(
     assert "secret" not in caplog.text
 
 
+def _fail_with(exc_type: type[Exception]) -> None:
+    raise exc_type
+
+
+def test_handle_exceptions_samples_logs(caplog: pytest.LogCaptureFixture) -> None:
+    fail = handle_exceptions(log_first=2, log_every=3)(_fail_with)
+
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        for _ in range(10):
+            fail(ValueError)
+        fail(KeyError)
+
+    assert [record.exc_info[0] for record in caplog.records if record.exc_info] == [
+        ValueError,
+        ValueError,
+        ValueError,
+        ValueError,
+        KeyError,
+    ]
+    assert len(caplog.records) == 5
+
+
+def test_handle_exceptions_always_logs_first_failure(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    fail = handle_exceptions(log_every=3)(_fail_with)
+
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        for _ in range(7):
+            fail(ValueError)
+        fail(KeyError)
+
+    assert [record.exc_info[0] for record in caplog.records if record.exc_info] == [
+        ValueError,
+        ValueError,
+        ValueError,
+        KeyError,
+    ]
+
+
+def test_handle_exceptions_summarises_suppressed_logs(
+    caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [0]
+    monkeypatch.setattr(time, "monotonic_ns", lambda: now[0])
+    fail = handle_exceptions(
+        log_first=1, log_every=100, summary_interval=Timing(seconds=10)
+    )(_fail_with)
+
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        for _ in range(5):
+            fail(ValueError)
+        fail(KeyError)
+        fail(KeyError)
+        now[0] = Timing(seconds=12).nanoseconds
+        fail(ValueError)
+        fail(ValueError)
+
+    messages = [record.message for record in caplog.records]
+    assert messages == [
+        (
+            "Function `_fail_with` threw `ValueError` when called with "
+            "args=(<class 'ValueError'>,) and kwargs={}"
+        ),
+        (
+            "Function `_fail_with` threw `KeyError` when called with "
+            "args=(<class 'KeyError'>,) and kwargs={}"
+        ),
+        "Function `_fail_with` threw `ValueError` 5 more times in the last 12.00s",
+        "Function `_fail_with` threw `KeyError` 1 more times in the last 12.00s",
+    ]
+    assert all(record.exc_info is None for record in caplog.records[2:])
+
+
+def test_handle_exceptions_summaries_wait_for_suppressed_logs(
+    caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [0]
+    monkeypatch.setattr(time, "monotonic_ns", lambda: now[0])
+    fail = handle_exceptions(
+        log_first=1, log_every=2, summary_interval=Timing(seconds=1)
+    )(_fail_with)
+
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        now[0] = Timing(seconds=5).nanoseconds
+        fail(ValueError)
+
+    assert len(caplog.records) == 1
+
+
+def test_handle_exceptions_never_summarises_trailing_suppressed_logs(
+    caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    now = [0]
+    monkeypatch.setattr(time, "monotonic_ns", lambda: now[0])
+    fail = handle_exceptions(log_every=2, summary_interval=Timing(seconds=10))(
+        _fail_with
+    )
+
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        fail(ValueError)
+        now[0] = Timing(seconds=5).nanoseconds
+        fail(ValueError)
+        now[0] = Timing(minutes=5).nanoseconds
+
+    assert len(caplog.records) == 1
+
+
+def test_handle_exceptions_truncates_arguments(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    @handle_exceptions(exceptions=(ValueError,), max_arg_length=30)
+    def parse(text: str, *, strict: bool) -> None:
+        if text and strict:
+            raise ValueError
+
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        parse("x" * 10_000, strict=True)
+
+    match = re.fullmatch(
+        r"Function `parse` threw `ValueError` when called with "
+        r"args=(.*) and kwargs=\{'strict': True\}",
+        caplog.records[0].message,
+    )
+    assert match is not None
+    assert match[1].startswith("('xxx")
+    assert match[1].endswith("...")
+    assert len(match[1]) == 30
+
+
+def test_handle_exceptions_does_not_render_disabled_records(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    rendered = mock.Mock(return_value="rendered")
+
+    class Argument:
+        __repr__ = rendered
+
+    @handle_exceptions(max_arg_length=10)
+    def fail(argument: Argument) -> None:
+        raise ValueError(argument)
+
+    with caplog.at_level(logging.WARNING, logger="pyutilkit.files"):
+        assert fail(Argument()) is None
+
+    assert caplog.records == []
+    rendered.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("options", "message"),
+    [
+        ({"log_first": -1}, "log_first must not be negative"),
+        ({"log_every": 0}, "log_every must be at least 1"),
+        ({"summary_interval": Timing()}, "summary_interval must be positive"),
+        ({"max_arg_length": 0}, "max_arg_length must be at least 1"),
+    ],
+)
+def test_handle_exceptions_validates_sampling_options(
+    options: dict[str, int | Timing], message: str
+) -> None:
+    with pytest.raises(ValueError, match=message):
+        handle_exceptions(**options)  # type: ignore[arg-type]  # ty: ignore[invalid-argument-type]
+
+
+def test_handle_exceptions_wraps_coroutine_functions(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    @handle_exceptions(exceptions=(ZeroDivisionError,), default=0.0)
+    async def invert(n: int) -> float:
+        await asyncio.sleep(0)
+        return 1 / n
+
+    @handle_exceptions(exceptions=(TypeError,))
+    async def unhandled() -> float:
+        return 1 / 0
+
+    assert inspect.iscoroutinefunction(invert)
+    assert invert.__name__ == "invert"
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        assert asyncio.run(invert(2)) == 0.5
+        assert asyncio.run(invert(0)) == 0.0
+        with pytest.raises(ZeroDivisionError):
+            asyncio.run(unhandled())
+
+    assert len(caplog.records) == 1
+    assert caplog.records[0].message == (
+        "Function `invert` threw `ZeroDivisionError` when called with "
+        "args=(0,) and kwargs={}"
+    )
+
+
+async def _collect(generator: AsyncGenerator[int, None]) -> list[int]:
+    return [item async for item in generator]
+
+
+def test_handle_exceptions_wraps_async_generator_functions(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    @handle_exceptions(exceptions=(ValueError,), log_level="error")
+    async def numbers(stop: int, *, fail: bool) -> AsyncGenerator[int, None]:
+        for number in range(stop):
+            yield number
+        if fail:
+            raise ValueError
+
+    @handle_exceptions(exceptions=(TypeError,))
+    async def unhandled() -> AsyncGenerator[int, None]:
+        yield 1
+        raise ValueError
+
+    assert inspect.isasyncgenfunction(numbers)
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        assert asyncio.run(_collect(numbers(3, fail=False))) == [0, 1, 2]
+        assert asyncio.run(_collect(numbers(3, fail=True))) == [0, 1, 2]
+        assert asyncio.run(_collect(numbers(0, fail=True))) == []
+        with pytest.raises(ValueError):  # noqa: PT011
+            asyncio.run(_collect(unhandled()))
+
+    assert len(caplog.records) == 2
+    assert all(record.levelno == logging.ERROR for record in caplog.records)
+    assert caplog.records[0].message == (
+        "Function `numbers` threw `ValueError` when called with "
+        "args=(3,) and kwargs={'fail': True}"
+    )
+
+
+def test_handle_exceptions_async_generators_support_asend_athrow_and_aclose(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    closed = []
+
+    @handle_exceptions(exceptions=(ValueError,))
+    async def echo() -> AsyncGenerator[str, str]:
+        received = "start"
+        try:
+            while True:
+                try:
+                    received = yield received
+                except KeyError:
+                    received = "recovered"
+        finally:
+            closed.append(received)
+
+    async def drive() -> list[str]:
+        generator = echo()
+        results = [await anext(generator)]
+        results.append(await generator.asend("hello"))
+        results.append(await generator.athrow(KeyError()))
+        await generator.aclose()
+        generator = echo()
+        await anext(generator)
+        with pytest.raises(StopAsyncIteration):
+            await generator.athrow(ValueError())
+        return results
+
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        assert asyncio.run(drive()) == ["start", "hello", "recovered"]
+
+    assert closed == ["recovered", "start"]
+    assert len(caplog.records) == 1
+
+
+def test_handle_exceptions_records_metrics() -> None:
+    metrics = MetricsRegistry()
+
+    @handle_exceptions(exceptions=(ZeroDivisionError,), default=0.0, metrics=metrics)
+    def invert(n: int) -> float:
+        return 1 / n
+
+    invert(1)
+    invert(2)
+    invert(0)
+    with pytest.raises(TypeError):
+        invert(cast("int", "one"))
+
+    snapshot = metrics.snapshot()
+    name = f"{__name__}.test_handle_exceptions_records_metrics.<locals>.invert"
+    assert list(snapshot) == [name]
+    function_metrics = snapshot[name]
+    assert function_metrics.calls == 4
+    assert function_metrics.failures == {ZeroDivisionError: 1, TypeError: 1}
+    assert (
+        Timing()
+        < function_metrics.min_time
+        <= function_metrics.average_time
+        <= function_metrics.max_time
+    )
+    assert function_metrics.total_time == function_metrics.average_time * 4 + Timing(
+        nanoseconds=function_metrics.total_time.nanoseconds % 4
+    )
+
+
+def test_handle_exceptions_records_async_metrics() -> None:
+    metrics = MetricsRegistry()
+
+    @handle_exceptions(exceptions=(ValueError,), metrics=metrics)
+    async def check(n: int) -> int:
+        if n < 0:
+            raise ValueError
+        return n
+
+    @handle_exceptions(exceptions=(ValueError,), metrics=metrics)
+    async def numbers(stop: int) -> AsyncGenerator[int, None]:
+        for number in range(stop):
+            yield number
+        raise ValueError
+
+    async def drive() -> None:
+        await check(1)
+        await check(-1)
+        assert [n async for n in numbers(2)] == [0, 1]
+        generator = numbers(5)
+        await anext(generator)
+        await generator.aclose()
+
+    asyncio.run(drive())
+
+    snapshot = {
+        name.rsplit(".", 1)[1]: value for name, value in metrics.snapshot().items()
+    }
+    assert snapshot["check"].calls == 2
+    assert snapshot["check"].failures == {ValueError: 1}
+    assert snapshot["numbers"].calls == 2
+    assert snapshot["numbers"].failures == {ValueError: 1}
+
+
+def test_metrics_registry_snapshots_are_consistent_copies() -> None:
+    metrics = MetricsRegistry()
+
+    @handle_exceptions(metrics=metrics)
+    def noop() -> None:
+        pass
+
+    before = metrics.snapshot()
+    threads = [
+        threading.Thread(target=lambda: [noop() for _ in range(1000)]) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    (name,) = before
+    assert before[name] == FunctionMetrics(
+        calls=0,
+        failures={},
+        total_time=Timing(),
+        min_time=Timing(),
+        max_time=Timing(),
+    )
+    assert before[name].average_time == Timing()
+    assert metrics.snapshot()[name].calls == 4000
+
+
+def test_metrics_registry_retires_counters_of_finished_threads() -> None:
+    metrics = MetricsRegistry()
+
+    @handle_exceptions(exceptions=(ValueError,), metrics=metrics)
+    def parse(text: str) -> int:
+        return int(text)
+
+    for index in range(200):
+        thread = threading.Thread(target=parse, args=("x" if index % 2 else "1",))
+        thread.start()
+        thread.join()
+
+    name = f"{parse.__module__}.{parse.__qualname__}"
+    assert len(metrics.counters(name)._shards) <= 2
+    snapshot = metrics.snapshot()[name]
+    assert metrics.counters(name)._shards == []
+    assert snapshot.calls == 200
+    assert snapshot.failures == {ValueError: 100}
+    assert snapshot.min_time <= snapshot.average_time <= snapshot.max_time
+
+
+def test_metrics_registry_shares_counters_between_decorations() -> None:
+    metrics = MetricsRegistry()
+
+    def noop() -> None:
+        pass
+
+    handle_exceptions(metrics=metrics)(noop)()
+    handle_exceptions(metrics=metrics)(noop)()
+
+    assert [value.calls for value in metrics.snapshot().values()] == [2]
+
+
+class _Clock:
+    def __init__(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        self.now = 0
+        monkeypatch.setattr(time, "monotonic_ns", lambda: self.now)
+
+    def advance(self, timing: Timing) -> None:
+        self.now += timing.nanoseconds
+
+
+def test_circuit_breaker_opens_and_closes(
+    caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    clock = _Clock(monkeypatch)
+    breaker = CircuitBreaker(
+        failure_rate=0.5,
+        window=Timing(seconds=10),
+        min_calls=4,
+        cooldown=Timing(seconds=30),
+        half_open_calls=2,
+    )
+    calls: list[bool] = []
+
+    @handle_exceptions(default=-1, circuit_breaker=breaker)
+    def call(*, fail: bool) -> int:
+        calls.append(fail)
+        if fail:
+            raise TimeoutError
+        return 1
+
+    states: list[CircuitState] = []
+    with caplog.at_level(logging.INFO, logger="pyutilkit.files"):
+        assert [call(fail=fail) for fail in (False, True, False)] == [1, -1, 1]
+        states.append(breaker.state)
+        assert call(fail=True) == -1
+        states.append(breaker.state)
+
+        assert call(fail=False) == -1
+        assert len(calls) == 4
+
+        clock.advance(Timing(seconds=30))
+        assert call(fail=False) == 1
+        states.append(breaker.state)
+        assert call(fail=False) == 1
+        states.append(breaker.state)
+        assert len(calls) == 6
+
+    assert states == ["closed", "open", "half_open", "closed"]
+
+    messages = [record.message for record in caplog.records if record.exc_info is None]
+    assert messages == [
+        "Circuit opened after 2 failures in 4 calls; retrying in 30.00s",
+        "Circuit closed after 2 successful probes",
+    ]
+
+
+def test_circuit_breaker_reopens_after_failed_probe(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    clock = _Clock(monkeypatch)
+    breaker = CircuitBreaker(min_calls=1, cooldown=Timing(seconds=5))
+
+    breaker.record(failed=True)
+    clock.advance(Timing(seconds=5))
+    assert breaker.allow()
+    states = [breaker.state]
+    breaker.record(failed=True)
+    states.append(breaker.state)
+
+    assert states == ["half_open", "open"]
+    assert not breaker.allow()
+
+
+def test_circuit_breaker_limits_probes(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = _Clock(monkeypatch)
+    breaker = CircuitBreaker(min_calls=1, cooldown=Timing(seconds=5), half_open_calls=2)
+    breaker.record(failed=True)
+    clock.advance(Timing(seconds=5))
+
+    assert [breaker.allow() for _ in range(3)] == [True, True, False]
+    clock.advance(Timing(seconds=5))
+    assert breaker.allow()
+
+
+def test_circuit_breaker_forgets_failures_outside_the_window(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    clock = _Clock(monkeypatch)
+    breaker = CircuitBreaker(failure_rate=0.5, window=Timing(seconds=10), min_calls=4)
+
+    for _ in range(3):
+        breaker.record(failed=True)
+    clock.advance(Timing(seconds=11))
+    breaker.record(failed=True)
+    states = [breaker.state]
+    breaker.record(failed=False)
+    breaker.record(failed=True)
+    breaker.record(failed=True)
+    states.append(breaker.state)
+
+    assert states == ["closed", "open"]
+
+
+def test_circuit_breaker_ignores_late_outcomes_while_open() -> None:
+    breaker = CircuitBreaker(min_calls=1)
+    breaker.record(failed=True)
+
+    breaker.record(failed=False)
+
+    assert breaker.state == "open"
+
+
+def test_circuit_breaker_rechecks_state_under_lock() -> None:
+    breaker = CircuitBreaker()
+
+    assert breaker._allow_probe()
+
+
+def test_circuit_breaker_short_circuits_async_functions() -> None:
+    breaker = CircuitBreaker(min_calls=1)
+    breaker.record(failed=True)
+    calls = []
+
+    @handle_exceptions(default=0, circuit_breaker=breaker)
+    async def fetch() -> int:
+        calls.append("fetch")
+        return 1
+
+    @handle_exceptions(circuit_breaker=breaker)
+    async def stream() -> AsyncGenerator[int, None]:
+        calls.append("stream")
+        yield 1
+
+    async def drive() -> tuple[int | None, list[int]]:
+        return await fetch(), [n async for n in stream()]
+
+    assert asyncio.run(drive()) == (0, [])
+    assert calls == []
+
+
+@pytest.mark.parametrize(
+    ("options", "message"),
+    [
+        ({"failure_rate": 0}, r"failure_rate must be in \(0, 1\]"),
+        ({"failure_rate": 1.5}, r"failure_rate must be in \(0, 1\]"),
+        ({"window": Timing()}, "window and cooldown must be positive"),
+        ({"cooldown": Timing(seconds=-1)}, "window and cooldown must be positive"),
+        ({"min_calls": 0}, "min_calls and half_open_calls must be at least 1"),
+        ({"half_open_calls": 0}, "min_calls and half_open_calls must be at least 1"),
+    ],
+)
+def test_circuit_breaker_validates_arguments(
+    options: dict[str, float | Timing], message: str
+) -> None:
+    with pytest.raises(ValueError, match=message):
+        CircuitBreaker(**options)  # type: ignore[arg-type]  # ty: ignore[invalid-argument-type]
+
+
+def test_memoize_caches_results() -> None:
+    calls: list[tuple[int, int]] = []
+
+    @memoize()
+    def add(x: int, y: int = 0) -> int:
+        calls.append((x, y))
+        return x + y
+
+    assert add(1) == 1
+    assert add(1) == 1
+    assert add(1, y=2) == 3
+    assert add(1, y=2) == 3
+    assert calls == [(1, 0), (1, 2)]
+    assert add.cache_info() == CacheInfo(hits=2, misses=2, max_size=128, size=2)
+    assert add.__wrapped__.__name__ == "add"  # ty: ignore[unresolved-attribute]
+
+    add.cache_clear()
+    assert add.cache_info() == CacheInfo(hits=0, misses=0, max_size=128, size=0)
+    assert add(1) == 1
+    assert len(calls) == 3
+
+
+def test_memoize_evicts_least_recently_used() -> None:
+    calls: list[int] = []
+
+    @memoize(max_size=2)
+    def square(x: int) -> int:
+        calls.append(x)
+        return x * x
+
+    square(1)
+    square(2)
+    square(1)
+    square(3)
+    square(1)
+    square(2)
+    assert calls == [1, 2, 3, 2]
+    assert square.cache_info().size == 2
+
+
+def test_memoize_expires_results(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = _Clock(monkeypatch)
+    calls: list[str] = []
+
+    @memoize(ttl=Timing(seconds=5))
+    def lookup(name: str) -> str:
+        calls.append(name)
+        return name.upper()
+
+    assert lookup("a") == "A"
+    clock.advance(Timing(seconds=4))
+    assert lookup("a") == "A"
+    clock.advance(Timing(seconds=1))
+    assert lookup("a") == "A"
+    assert calls == ["a", "a"]
+    assert lookup.cache_info() == CacheInfo(hits=1, misses=2, max_size=128, size=1)
+
+
+def test_memoize_does_not_cache_exceptions() -> None:
+    calls: list[int] = []
+
+    @memoize(max_size=None)
+    def flaky(x: int) -> int:
+        calls.append(x)
+        if len(calls) == 1:
+            msg = "first call"
+            raise RuntimeError(msg)
+        return x
+
+    with pytest.raises(RuntimeError, match="first call"):
+        flaky(1)
+    assert flaky(1) == 1
+    assert flaky.cache_info() == CacheInfo(hits=0, misses=2, max_size=None, size=1)
+
+
+def test_memoize_methods() -> None:
+    class Config:
+        def __init__(self, prefix: str) -> None:
+            self.prefix = prefix
+
+        @memoize()
+        def get(self, key: str) -> str:
+            return self.prefix + key
+
+    first, second = Config("a."), Config("b.")
+    assert first.get("x") == "a.x"  # ty: ignore[invalid-attribute-access]
+    assert second.get("x") == "b.x"  # ty: ignore[invalid-attribute-access]
+    assert first.get("x") == "a.x"  # ty: ignore[invalid-attribute-access]
+    assert isinstance(Config.get, Memoized)
+    assert first.get.cache_info() == CacheInfo(hits=1, misses=2, max_size=128, size=2)  # ty: ignore[invalid-attribute-access]
+
+
+def test_memoize_computes_concurrent_calls_once() -> None:
+    started = threading.Event()
+    release = threading.Event()
+    calls: list[int] = []
+
+    @memoize()
+    def slow(x: int) -> int:
+        calls.append(x)
+        started.set()
+        release.wait()
+        return x * 10
+
+    results: list[int] = []
+    threads = [
+        threading.Thread(target=lambda: results.append(slow(1))) for _ in range(5)
+    ]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    while slow.cache_info().hits < len(threads) - 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [10] * 5
+    assert calls == [1]
+    assert slow.cache_info() == CacheInfo(hits=4, misses=1, max_size=128, size=1)
+
+
+def test_memoize_shares_exceptions_with_concurrent_calls() -> None:
+    started = threading.Event()
+    release = threading.Event()
+
+    @memoize()
+    def broken() -> None:
+        started.set()
+        release.wait()
+        msg = "broken"
+        raise RuntimeError(msg)
+
+    errors: list[BaseException] = []
+
+    def call() -> None:
+        try:
+            broken()
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while broken.cache_info().hits < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    waiter.join()
+
+    assert len(errors) == 2
+    assert errors[0] is errors[1]
+    assert broken.cache_info().size == 0
+
+
+def test_memoize_async_functions() -> None:
+    calls: list[int] = []
+
+    @memoize(max_size=4)
+    async def fetch(x: int) -> int:
+        calls.append(x)
+        await asyncio.sleep(0)
+        return x + 1
+
+    async def main() -> list[int]:
+        first = await asyncio.gather(*(fetch(1) for _ in range(5)))
+        return [*first, await fetch(1), await fetch(2)]
+
+    assert asyncio.run(main()) == [2, 2, 2, 2, 2, 2, 3]
+    assert calls == [1, 2]
+    assert fetch.cache_info() == CacheInfo(hits=5, misses=2, max_size=4, size=2)
+
+
+def test_memoize_async_shares_exceptions() -> None:
+    calls: list[int] = []
+
+    @memoize()
+    async def broken() -> None:
+        calls.append(1)
+        await asyncio.sleep(0)
+        msg = "broken"
+        raise RuntimeError(msg)
+
+    async def main() -> tuple[BaseException | None, ...]:
+        return await asyncio.gather(broken(), broken(), return_exceptions=True)
+
+    first, second = asyncio.run(main())
+    assert isinstance(first, RuntimeError)
+    assert first is second
+    assert calls == [1]
+
+    async def alone() -> None:
+        await broken()
+
+    with pytest.raises(RuntimeError, match="broken"):
+        asyncio.run(alone())
+    assert broken.cache_info().size == 0
+
+
+def test_memoize_async_retries_after_cancelled_computation() -> None:
+    calls: list[int] = []
+
+    @memoize()
+    async def fetch() -> int:
+        calls.append(1)
+        await asyncio.sleep(0 if len(calls) > 1 else 10)
+        return len(calls)
+
+    async def main() -> int:
+        leader = asyncio.create_task(fetch())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(fetch())
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == 2
+    assert calls == [1, 1]
+
+
+def test_memoize_async_cancelled_waiter() -> None:
+    release = asyncio.Event()
+
+    @memoize()
+    async def fetch() -> int:
+        await release.wait()
+        return 1
+
+    async def main() -> int:
+        leader = asyncio.create_task(fetch())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(fetch())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        release.set()
+        return await leader
+
+    assert asyncio.run(main()) == 1
+
+
+@pytest.mark.parametrize(
+    ("options", "message"),
+    [
+        ({"max_size": 0}, "max_size must be at least 1"),
+        ({"ttl": Timing()}, "ttl must be positive"),
+    ],
+)
+def test_memoize_validates_arguments(
+    options: dict[str, int | Timing], message: str
+) -> None:
+    with pytest.raises(ValueError, match=message):
+        memoize(**options)  # type: ignore[arg-type]  # ty: ignore[invalid-argument-type]
+
+
+def test_memoize_rejects_async_generator_functions() -> None:
+    async def numbers() -> AsyncGenerator[int, None]:
+        yield 1
+
+    with pytest.raises(TypeError, match="Async generator functions"):
+        memoize()(numbers)
+
+
 def test_hash_file() -> None:
     dev_null_hash = "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
     assert hash_file(Path(os.devnull)) == dev_null_hash
@@ -127,3 +996,1430 @@ def test_hash_file_rejects_non_positive_buffer_size(
     expected = hashlib.sha256(content).hexdigest()
     assert expected != hashlib.sha256().hexdigest()
     assert hash_file(tmp_file, buffer_size=1) == expected
+
+
+@pytest.mark.parametrize("engine", ["auto", "read", "readinto", "mmap"])
+@pytest.mark.parametrize("size", [0, 1, 4095, 4096, 100_003])
+@pytest.mark.parametrize("buffer_size", [None, 1000])
+def test_hash_file_engines_match_sha256(
+    engine: HashEngine, size: int, buffer_size: int | None, tmp_path: Path
+) -> None:
+    content = os.urandom(size)
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(content)
+
+    digest = hash_file(tmp_file, buffer_size=buffer_size, engine=engine)
+
+    assert digest == hashlib.sha256(content).hexdigest()
+
+
+@pytest.mark.parametrize("engine", ["auto", "read", "readinto", "mmap"])
+def test_hash_file_engines_support_devices(engine: HashEngine) -> None:
+    dev_null_hash = "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
+    assert hash_file(Path(os.devnull), engine=engine) == dev_null_hash
+
+
+def test_hash_file_rejects_unknown_engine(tmp_path: Path) -> None:
+    invalid_engine = cast("HashEngine", "mmapp")
+
+    with pytest.raises(ValueError, match="Unsupported hash engine 'mmapp'"):
+        hash_file(tmp_path / "missing.txt", engine=invalid_engine)
+
+
+@pytest.mark.parametrize(
+    ("size", "block_size", "expected"),
+    [
+        (0, 4096, 4096),
+        (100, 4096, 4096),
+        (5000, 4096, 8192),
+        (10 * 2**20, 4096, 2**20),
+        (100, 0, 2**16),
+    ],
+)
+def test_auto_buffer_size(size: int, block_size: int, expected: int) -> None:
+    file_stat = SimpleNamespace(st_size=size, st_blksize=block_size)
+    buffer_size = files_module._auto_buffer_size(cast("os.stat_result", file_stat))
+    assert buffer_size == expected
+
+
+@pytest.mark.parametrize("algorithm", ["md5", "sha1", "blake2b", "sha3_256"])
+def test_hash_file_with_algorithm(algorithm: str, tmp_path: Path) -> None:
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(b"Hello, World!")
+
+    digest = hash_file(tmp_file, algorithm=algorithm)
+
+    assert digest == hashlib.new(algorithm, b"Hello, World!").hexdigest()
+
+
+@pytest.mark.parametrize("engine", ["auto", "read", "readinto", "mmap"])
+def test_hash_file_digests_reads_once(engine: HashEngine, tmp_path: Path) -> None:
+    content = os.urandom(50_000)
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(content)
+
+    digests = hash_file_digests(
+        tmp_file, ("sha256", "blake2b", "md5", "sha256"), 4096, engine=engine
+    )
+
+    assert list(digests) == ["sha256", "blake2b", "md5"]
+    for algorithm, digest in digests.items():
+        assert digest == hashlib.new(algorithm, content).hexdigest()
+
+
+def test_hash_file_digests_requires_an_algorithm(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="At least one algorithm is required"):
+        hash_file_digests(tmp_path / "missing.txt", ())
+
+
+@pytest.mark.parametrize(
+    ("algorithm", "message"),
+    [
+        ("sha257", "unsupported hash type"),
+        ("shake_128", "Variable-length algorithm 'shake_128' is not supported"),
+    ],
+)
+def test_hash_file_rejects_unusable_algorithms(
+    algorithm: str, message: str, tmp_path: Path
+) -> None:
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(b"data")
+
+    with pytest.raises(ValueError, match=message):
+        hash_file(tmp_file, algorithm=algorithm)
+    with pytest.raises(ValueError, match=message):
+        hash_file_digests(tmp_file, ("sha256", algorithm))
+    with pytest.raises(ValueError, match=message):
+        hash_files([tmp_file], algorithm=algorithm)
+
+
+def _write_old_file(path: Path, content: bytes) -> Path:
+    path.write_bytes(content)
+    an_hour_ago = path.stat().st_mtime_ns - 3_600_000_000_000
+    os.utime(path, ns=(an_hour_ago, an_hour_ago))
+    return path
+
+
+def test_hash_file_with_cache_skips_reading(tmp_path: Path) -> None:
+    tmp_file = _write_old_file(tmp_path / "data.bin", b"cached content")
+    expected = hashlib.sha256(b"cached content").hexdigest()
+
+    with HashCache() as cache:
+        assert hash_file(tmp_file, cache=cache) == expected
+        assert len(cache) == 1
+        with mock.patch.object(files_module, "_feed_file") as feed_file:
+            assert hash_file(tmp_file, cache=cache) == expected
+        feed_file.assert_not_called()
+
+
+def test_hash_file_with_cache_ignores_non_regular_files() -> None:
+    dev_null = Path(os.devnull)
+    dev_null_hash = hashlib.sha256(b"").hexdigest()
+
+    with HashCache() as cache:
+        with mock.patch.object(HashCache, "set") as cache_set:
+            assert hash_file(dev_null, cache=cache) == dev_null_hash
+        cache_set.assert_not_called()
+
+        cache.set(dev_null.stat(), "sha256", "stale")
+        assert hash_file(dev_null, cache=cache) == dev_null_hash
+
+
+def test_hash_file_with_cache_detects_changes(tmp_path: Path) -> None:
+    tmp_file = _write_old_file(tmp_path / "data.bin", b"old content")
+
+    with HashCache() as cache:
+        hash_file(tmp_file, cache=cache)
+        _write_old_file(tmp_file, b"new content, new size")
+        digest = hash_file(tmp_file, cache=cache)
+
+        assert digest == hashlib.sha256(b"new content, new size").hexdigest()
+        assert len(cache) == 1
+
+
+def test_hash_cache_does_not_store_recently_modified_files(tmp_path: Path) -> None:
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(b"fresh content")
+
+    with HashCache() as cache:
+        assert hash_file(tmp_file, cache=cache) == hash_file(tmp_file)
+        assert len(cache) == 0
+
+
+def test_hash_file_digests_with_cache_computes_missing_digests(
+    tmp_path: Path,
+) -> None:
+    tmp_file = _write_old_file(tmp_path / "data.bin", b"content")
+
+    with HashCache() as cache:
+        hash_file(tmp_file, cache=cache)
+        file_stat = tmp_file.stat()
+        cache.set(file_stat, "sha256", "cached-sha256")
+
+        digests = hash_file_digests(tmp_file, ("sha256", "md5"), cache=cache)
+
+        assert digests == {
+            "sha256": "cached-sha256",
+            "md5": hashlib.md5(b"content").hexdigest(),  # noqa: S324
+        }
+        assert cache.get(file_stat, "md5") == digests["md5"]
+
+
+def test_hash_file_reports_progress(tmp_path: Path) -> None:
+    path = tmp_path / "data.bin"
+    data = _random_bytes(100_000)
+    path.write_bytes(data)
+    calls: list[tuple[int, int | None, Timing]] = []
+
+    digest = hash_file(
+        path,
+        buffer_size=2**14,
+        engine="readinto",
+        progress=lambda done, total, elapsed: calls.append((done, total, elapsed)),
+        progress_interval=Timing(),
+    )
+
+    assert digest == _sha256(data)
+    assert [done for done, _, _ in calls] == [
+        *range(2**14, len(data), 2**14),
+        len(data),
+    ]
+    assert {total for _, total, _ in calls} == {len(data)}
+    elapsed = [elapsed for _, _, elapsed in calls]
+    assert elapsed == sorted(elapsed)
+
+
+def test_hash_file_throttles_progress(tmp_path: Path) -> None:
+    path = tmp_path / "data.bin"
+    path.write_bytes(_random_bytes(100_000))
+    calls: list[int] = []
+
+    hash_file(
+        path,
+        buffer_size=2**10,
+        progress=lambda done, _total, _elapsed: calls.append(done),
+        progress_interval=Timing(days=1),
+    )
+
+    assert calls == [100_000]
+
+
+def test_hash_file_reports_progress_for_devices() -> None:
+    calls: list[tuple[int, int | None]] = []
+
+    hash_file(
+        Path(os.devnull),
+        progress=lambda done, total, _elapsed: calls.append((done, total)),
+    )
+
+    assert calls == [(0, None)]
+
+
+def test_hash_file_rejects_negative_progress_interval(tmp_path: Path) -> None:
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"data")
+
+    with pytest.raises(ValueError, match="progress_interval must not be negative"):
+        hash_file(path, progress_interval=Timing(seconds=-1))
+
+
+@pytest.mark.parametrize("engine", ["read", "readinto", "mmap"])
+def test_hash_file_collects_stats(engine: HashEngine, tmp_path: Path) -> None:
+    path = tmp_path / "data.bin"
+    data = _random_bytes(100_000)
+    path.write_bytes(data)
+    stats = HashStats()
+
+    digest = hash_file(path, buffer_size=2**12, engine=engine, stats=stats)
+
+    assert digest == _sha256(data)
+    assert stats.bytes_read == len(data)
+    assert stats.update_time > Timing()
+    assert stats.read_time + stats.update_time <= stats.elapsed
+    assert stats.throughput > 0
+
+
+def test_hash_file_stats_skip_cached_digests(tmp_path: Path) -> None:
+    path = _write_old_file(tmp_path / "data.bin", b"data")
+    calls: list[int] = []
+    stats = HashStats()
+
+    with HashCache() as cache:
+        hash_file(path, cache=cache)
+        hash_file(
+            path,
+            cache=cache,
+            progress=lambda done, _total, _elapsed: calls.append(done),
+            stats=stats,
+        )
+
+    assert calls == []
+    assert stats.bytes_read == 0
+    assert stats.read_time == stats.update_time == Timing()
+    assert stats.elapsed > Timing()
+
+
+def test_hash_stats_throughput_without_elapsed_time() -> None:
+    stats = HashStats()
+
+    assert stats.throughput == 0.0
+
+
+def test_hash_cache_persists_between_instances(tmp_path: Path) -> None:
+    tmp_file = _write_old_file(tmp_path / "data.bin", b"content")
+    database = tmp_path / "hashes.sqlite3"
+
+    with HashCache(database) as cache:
+        digest = hash_file(tmp_file, cache=cache)
+    with HashCache(database) as cache:
+        assert len(cache) == 1
+        assert cache.get(tmp_file.stat(), "sha256") == digest
+
+
+def test_hash_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    paths = [
+        _write_old_file(tmp_path / f"{index}.txt", b"x" * index) for index in range(4)
+    ]
+
+    with HashCache(max_entries=3) as cache:
+        for path in paths[:3]:
+            hash_file(path, cache=cache)
+        assert cache.get(paths[0].stat(), "sha256") is not None
+        hash_file(paths[3], cache=cache)
+
+        assert len(cache) == 3
+        assert cache.get(paths[0].stat(), "sha256") is not None
+        assert cache.get(paths[1].stat(), "sha256") is None
+        assert cache.get(paths[2].stat(), "sha256") is not None
+        assert cache.get(paths[3].stat(), "sha256") is not None
+
+
+def test_hash_cache_counts_replaced_entries_once(tmp_path: Path) -> None:
+    paths = [_write_old_file(tmp_path / f"{index}.txt", b"x") for index in range(2)]
+
+    with (
+        HashCache(max_entries=2) as cache,
+        mock.patch.object(HashCache, "_evict", wraps=cache._evict) as evict,
+    ):
+        first_stat = paths[0].stat()
+        cache.set(first_stat, "sha256", "old")
+        cache.set(first_stat, "sha256", "new")
+        cache.set(paths[1].stat(), "sha256", "other")
+
+        evict.assert_not_called()
+        assert len(cache) == 2
+        assert cache._size == 2
+        assert cache.get(first_stat, "sha256") == "new"
+        assert cache.get(paths[1].stat(), "sha256") == "other"
+
+
+def test_hash_cache_invalidate_and_clear(tmp_path: Path) -> None:
+    first = _write_old_file(tmp_path / "first.txt", b"first")
+    second = _write_old_file(tmp_path / "second.txt", b"second")
+
+    with HashCache() as cache:
+        hash_file_digests(first, ("sha256", "md5"), cache=cache)
+        hash_file(second, cache=cache)
+        assert len(cache) == 3
+
+        cache.invalidate(first)
+        assert len(cache) == 1
+        assert cache.get(first.stat(), "sha256") is None
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+def test_hash_cache_rejects_non_positive_size() -> None:
+    with pytest.raises(ValueError, match="max_entries must be at least 1"):
+        HashCache(max_entries=0)
+
+
+def test_hash_files_matches_hash_file(tmp_path: Path) -> None:
+    paths = []
+    for index in range(20):
+        path = tmp_path / f"file-{index}.bin"
+        path.write_bytes(os.urandom(index * 1000))
+        paths.append(path)
+
+    results = list(hash_files(paths, workers=4, buffer_size=1024))
+
+    assert sorted(result.path for result in results) == sorted(paths)
+    for result in results:
+        assert result.error is None
+        assert result.digest == hash_file(result.path)
+
+
+def test_hash_files_ordered_preserves_input_order(tmp_path: Path) -> None:
+    paths = []
+    for index in range(10):
+        path = tmp_path / f"file-{index}.txt"
+        path.write_text(str(index))
+        paths.append(path)
+
+    results = list(hash_files(iter(paths), workers=3, algorithm="md5", ordered=True))
+
+    assert [result.path for result in results] == paths
+    assert [result.digest for result in results] == [
+        hashlib.md5(str(index).encode()).hexdigest()  # noqa: S324
+        for index in range(10)
+    ]
+
+
+def test_hash_files_reports_errors_without_aborting(tmp_path: Path) -> None:
+    existing = tmp_path / "existing.txt"
+    existing.write_bytes(b"content")
+    missing = tmp_path / "missing.txt"
+
+    results = list(hash_files([missing, existing], workers=1, ordered=True))
+
+    assert results[0].path == missing
+    assert results[0].digest is None
+    assert isinstance(results[0].error, FileNotFoundError)
+    assert results[1].digest == hashlib.sha256(b"content").hexdigest()
+    assert results[1].error is None
+
+
+def test_hash_files_default_workers(tmp_path: Path) -> None:
+    path = _write_old_file(tmp_path / "file.txt", b"content")
+
+    with HashCache() as cache:
+        results = list(hash_files([path], cache=cache))
+        assert len(cache) == 1
+
+    assert [result.digest for result in results] == [hash_file(path)]
+
+
+def test_hash_files_stops_consuming_paths_when_closed(tmp_path: Path) -> None:
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"content")
+    consumed: list[int] = []
+
+    def generate_paths() -> Iterator[Path]:
+        for index in range(1_000):
+            consumed.append(index)
+            yield path
+
+    results = hash_files(generate_paths(), workers=2)
+    assert next(results).digest == hash_file(path)
+    results.close()
+
+    assert len(consumed) <= 5
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "message"),
+    [
+        ({"workers": 0}, "workers must be at least 1"),
+        ({"buffer_size": 0}, "buffer_size must be at least 1"),
+    ],
+)
+def test_hash_files_validates_arguments_eagerly(
+    kwargs: dict[str, int], message: str
+) -> None:
+    with pytest.raises(ValueError, match=message):
+        hash_files([], **kwargs)  # type: ignore[arg-type]  # ty: ignore[invalid-argument-type]
+
+
+def _build_tree(root: Path) -> None:
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "docs").mkdir()
+    (root / "empty").mkdir()
+    _write_old_file(root / "README.md", b"readme")
+    _write_old_file(root / "src" / "main.py", b"print()")
+    _write_old_file(root / "src" / "pkg" / "module.py", b"x = 1")
+    _write_old_file(root / "docs" / "index.md", b"docs")
+
+
+def _scanned(root: Path, entries: Iterable[os.DirEntry[str]]) -> set[str]:
+    return {Path(entry.path).relative_to(root).as_posix() for entry in entries}
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_scan_tree(workers: int, tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    for index in range(50):
+        directory = tmp_path / "many" / str(index % 7)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{index}.txt").write_bytes(b"")
+
+    entries = list(scan_tree(tmp_path, workers=workers))
+
+    expected = {
+        Path(directory, name).relative_to(tmp_path).as_posix()
+        for directory, _, names in os.walk(tmp_path)
+        for name in names
+    }
+    assert len(entries) == len(expected) == 54
+    assert {Path(e.path).relative_to(tmp_path).as_posix() for e in entries} == (
+        expected
+    )
+    assert all(entry.is_file() for entry in entries)
+
+
+def test_scan_tree_filters(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "generated.py").write_bytes(b"")
+    (tmp_path / "src" / "scratch.py.tmp").write_bytes(b"")
+
+    assert _scanned(
+        tmp_path, scan_tree(tmp_path, include=["*.py", "*.tmp"], exclude=["build"])
+    ) == {
+        "src/main.py",
+        "src/pkg/module.py",
+        "src/scratch.py.tmp",
+    }
+    assert _scanned(
+        tmp_path, scan_tree(tmp_path, exclude=["pkg", "*.md", "*.tmp"])
+    ) == {
+        "build/generated.py",
+        "src/main.py",
+    }
+
+
+def test_scan_tree_does_not_follow_symlinks_by_default(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    (tmp_path / "src" / "loop").symlink_to(tmp_path)
+
+    assert _scanned(tmp_path / "src", scan_tree(tmp_path / "src")) == {
+        "main.py",
+        "pkg/module.py",
+        "loop",
+    }
+
+
+def test_scan_tree_follows_symlinks_without_looping(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    (tmp_path / "src" / "loop").symlink_to(tmp_path)
+    (tmp_path / "docs" / "alias").symlink_to(tmp_path / "src" / "pkg")
+
+    scanned = _scanned(tmp_path, scan_tree(tmp_path, follow_symlinks=True))
+
+    assert scanned in (
+        {"README.md", "src/main.py", "docs/index.md", "src/pkg/module.py"},
+        {"README.md", "src/main.py", "docs/index.md", "docs/alias/module.py"},
+    )
+
+
+def test_scan_tree_reports_errors(tmp_path: Path) -> None:
+    errors: list[OSError] = []
+    missing = tmp_path / "missing"
+
+    assert list(scan_tree(missing)) == []
+    assert list(scan_tree(missing, follow_symlinks=True, onerror=errors.append)) == []
+
+    assert len(errors) == 1
+    assert isinstance(errors[0], FileNotFoundError)
+
+
+def test_scan_tree_can_be_closed_early(tmp_path: Path) -> None:
+    for index in range(20):
+        (tmp_path / str(index)).mkdir()
+        (tmp_path / str(index) / "file").write_bytes(b"")
+
+    entries = scan_tree(tmp_path, workers=2)
+    next(entries)
+    entries.close()
+
+
+def test_scan_tree_validates_workers_eagerly(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="workers must be at least 1"):
+        scan_tree(tmp_path, workers=0)
+
+
+def test_hash_tree(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+
+    tree = hash_tree(tmp_path)
+
+    assert tree.algorithm == "sha256"
+    assert set(tree.nodes) == {
+        ".",
+        "README.md",
+        "docs",
+        "docs/index.md",
+        "empty",
+        "src",
+        "src/main.py",
+        "src/pkg",
+        "src/pkg/module.py",
+    }
+    assert tree.nodes["src/main.py"].kind == "file"
+    assert tree.nodes["src/main.py"].digest == hash_file(tmp_path / "src/main.py")
+    assert tree.nodes["empty"].digest == hashlib.sha256().hexdigest()
+    expected_docs = hashlib.sha256(
+        b"file index.md\0" + hashlib.sha256(b"docs").digest()
+    ).hexdigest()
+    assert tree.nodes["docs"].kind == "directory"
+    assert tree.nodes["docs"].digest == expected_docs
+    assert tree.digest == tree.nodes["."].digest
+    assert hash_tree(tmp_path, workers=1).digest == tree.digest
+
+
+def test_hash_tree_changes_propagate_to_the_root(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    before = hash_tree(tmp_path)
+
+    _write_old_file(tmp_path / "src" / "pkg" / "module.py", b"x = 2")
+    after = hash_tree(tmp_path, before)
+
+    changed = {key for key in after.nodes if after.nodes[key] != before.nodes[key]}
+    assert changed == {".", "src", "src/pkg", "src/pkg/module.py"}
+    assert after.digest == hash_tree(tmp_path).digest
+
+
+def test_hash_tree_only_rehashes_changed_files(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    before = hash_tree(tmp_path)
+    _write_old_file(tmp_path / "docs" / "index.md", b"new docs")
+
+    with mock.patch.object(
+        files_module, "hash_file", wraps=files_module.hash_file
+    ) as hashed:
+        after = hash_tree(tmp_path, before)
+
+    assert [call.args[0] for call in hashed.call_args_list] == [
+        tmp_path / "docs" / "index.md"
+    ]
+    assert (
+        after.nodes["docs/index.md"].digest == hashlib.sha256(b"new docs").hexdigest()
+    )
+
+
+def test_hash_tree_rehashes_recently_modified_files(tmp_path: Path) -> None:
+    (tmp_path / "fresh.txt").write_bytes(b"fresh")
+    before = hash_tree(tmp_path)
+
+    with mock.patch.object(
+        files_module, "hash_file", wraps=files_module.hash_file
+    ) as hashed:
+        after = hash_tree(tmp_path, before)
+
+    hashed.assert_called_once()
+    assert after.digest == before.digest
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="requires named pipes")
+def test_hash_tree_hashes_symlinks_and_skips_special_files(tmp_path: Path) -> None:
+    _write_old_file(tmp_path / "target.txt", b"target")
+    (tmp_path / "link").symlink_to("target.txt")
+    os.mkfifo(tmp_path / "fifo")
+
+    tree = hash_tree(tmp_path)
+
+    assert set(tree.nodes) == {".", "link", "target.txt"}
+    assert tree.nodes["link"].kind == "symlink"
+    assert tree.nodes["link"].digest == hashlib.sha256(b"target.txt").hexdigest()
+
+
+def test_hash_tree_rejects_previous_tree_with_other_algorithm(tmp_path: Path) -> None:
+    previous = hash_tree(tmp_path, algorithm="md5")
+
+    with pytest.raises(ValueError, match="Cannot reuse a 'md5' tree"):
+        hash_tree(tmp_path, previous)
+
+
+def _expected_chunked_digest(content: bytes, chunk_size: int, algorithm: str) -> str:
+    hasher = hashlib.new(algorithm, f"chunked-{algorithm} {chunk_size}\n".encode())
+    for offset in range(0, len(content), chunk_size):
+        hasher.update(
+            hashlib.new(algorithm, content[offset : offset + chunk_size]).digest()
+        )
+    return hasher.hexdigest()
+
+
+@pytest.mark.parametrize("size", [0, 1, 999, 1000, 1001, 10_500])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_hash_file_chunked(size: int, workers: int, tmp_path: Path) -> None:
+    content = os.urandom(size)
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(content)
+
+    digest = hash_file_chunked(tmp_file, 1000, workers=workers, buffer_size=300)
+
+    assert digest == _expected_chunked_digest(content, 1000, "sha256")
+    assert digest != hash_file(tmp_file)
+
+
+def test_hash_file_chunked_defaults(tmp_path: Path) -> None:
+    content = os.urandom(100_000)
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(content)
+
+    digest = hash_file_chunked(tmp_file, algorithm="blake2b")
+
+    assert digest == _expected_chunked_digest(content, 2**24, "blake2b")
+
+
+def test_hash_file_chunked_without_positional_reads(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    content = os.urandom(10_000)
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(content)
+    monkeypatch.delattr(os, "preadv", raising=False)
+
+    digest = hash_file_chunked(tmp_file, 1024, workers=4)
+
+    assert digest == _expected_chunked_digest(content, 1024, "sha256")
+
+
+def test_hash_file_chunked_stops_at_end_of_truncated_file(tmp_path: Path) -> None:
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(b"abcdef")
+
+    with mock.patch.object(files_module, "_read_at", side_effect=[3, 0]):
+        digest = hash_file_chunked(tmp_file, 1000)
+
+    assert digest == _expected_chunked_digest(b"\0\0\0", 1000, "sha256")
+
+
+@pytest.mark.parametrize("chunk_size", [0, -1])
+def test_hash_file_chunked_rejects_non_positive_chunk_size(
+    chunk_size: int, tmp_path: Path
+) -> None:
+    with pytest.raises(ValueError, match="chunk_size must be at least 1"):
+        hash_file_chunked(tmp_path / "missing.bin", chunk_size)
+
+
+def _random_bytes(size: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(size)  # noqa: S311
+
+
+def test_chunk_file_covers_the_whole_file(tmp_path: Path) -> None:
+    content = _random_bytes(300_000)
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(content)
+
+    chunks = list(
+        chunk_file(
+            tmp_file, min_size=1024, avg_size=4096, max_size=16384, buffer_size=5000
+        )
+    )
+
+    assert chunks[0].offset == 0
+    for previous, chunk in itertools.pairwise(chunks):
+        assert chunk.offset == previous.offset + previous.length
+    assert chunks[-1].offset + chunks[-1].length == len(content)
+    assert all(1024 <= chunk.length <= 16384 for chunk in chunks[:-1])
+    for chunk in chunks:
+        data = content[chunk.offset : chunk.offset + chunk.length]
+        assert chunk.digest == hashlib.sha256(data).hexdigest()
+
+
+def test_chunk_file_boundaries_do_not_depend_on_buffer_size(tmp_path: Path) -> None:
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(_random_bytes(200_000))
+    chunker = partial(chunk_file, min_size=512, avg_size=2048, max_size=8192)
+
+    chunks = list(chunker(tmp_file))
+
+    assert list(chunker(tmp_file, buffer_size=777)) == chunks
+
+
+def test_chunk_file_resists_insertions(tmp_path: Path) -> None:
+    content = _random_bytes(200_000)
+    original = tmp_path / "original.bin"
+    original.write_bytes(content)
+    edited = tmp_path / "edited.bin"
+    edited.write_bytes(content[:1000] + b"inserted bytes" + content[1000:])
+    chunker = partial(chunk_file, min_size=512, avg_size=2048, max_size=8192)
+
+    original_digests = {chunk.digest for chunk in chunker(original)}
+    edited_digests = {chunk.digest for chunk in chunker(edited)}
+
+    assert len(original_digests - edited_digests) <= 2
+
+
+def test_chunk_file_fixed_size_chunks(tmp_path: Path) -> None:
+    tmp_file = tmp_path / "data.bin"
+    tmp_file.write_bytes(b"abcdefghij")
+
+    chunks = list(
+        chunk_file(tmp_file, min_size=4, avg_size=4, max_size=4, algorithm="md5")
+    )
+
+    assert chunks == [
+        Chunk(offset=0, length=4, digest=hashlib.md5(b"abcd").hexdigest()),  # noqa: S324
+        Chunk(offset=4, length=4, digest=hashlib.md5(b"efgh").hexdigest()),  # noqa: S324
+        Chunk(offset=8, length=2, digest=hashlib.md5(b"ij").hexdigest()),  # noqa: S324
+    ]
+
+
+def test_chunk_file_empty_file(tmp_path: Path) -> None:
+    tmp_file = tmp_path / "empty.bin"
+    tmp_file.write_bytes(b"")
+
+    assert list(chunk_file(tmp_file)) == []
+
+
+@pytest.mark.parametrize(
+    ("min_size", "avg_size", "max_size"),
+    [(0, 4, 8), (8, 4, 16), (4, 16, 8)],
+)
+def test_chunk_file_rejects_inconsistent_sizes(
+    min_size: int, avg_size: int, max_size: int, tmp_path: Path
+) -> None:
+    with pytest.raises(ValueError, match="Chunk sizes must satisfy"):
+        chunk_file(
+            tmp_path / "missing.bin",
+            min_size=min_size,
+            avg_size=avg_size,
+            max_size=max_size,
+        )
+
+
+class _ReadOnlyStream:
+    def __init__(self, content: bytes) -> None:
+        self._stream = io.BytesIO(content)
+
+    def read(self, size: int = -1, /) -> bytes:
+        return self._stream.read(size)
+
+
+class _PartialWriter:
+    def __init__(self) -> None:
+        self.written: list[bytes] = []
+
+    def write(self, data: ReadableBuffer, /) -> int | None:
+        view = memoryview(data)
+        if not view:
+            return None
+        self.written.append(bytes(view[:3]))
+        return min(len(view), 3)
+
+
+HELLO_WORLD_HASH = "dffd6021bb2bd5b0af676290809ec3a53191dd81c7f70a4b28688a362182986f"
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        io.BytesIO(b"Hello, World!"),
+        _ReadOnlyStream(b"Hello, World!"),
+        b"Hello, World!",
+        bytearray(b"Hello, World!"),
+        memoryview(b"Hello, World!"),
+        [b"Hello", b", ", b"World!"],
+        (chunk for chunk in (b"Hello, ", memoryview(b"World!"))),
+    ],
+)
+def test_hash_stream(source: object) -> None:
+    assert hash_stream(source, buffer_size=4) == HELLO_WORLD_HASH  # type: ignore[arg-type]  # ty: ignore[invalid-argument-type]
+
+
+def test_hash_stream_from_pipe() -> None:
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, "rb") as reader, open(write_fd, "wb") as writer:  # noqa: PTH123
+        writer.write(b"Hello, World!")
+        writer.close()
+        assert hash_stream(reader, algorithm="sha256") == HELLO_WORLD_HASH
+
+
+@pytest.mark.parametrize("source", [io.BytesIO, _ReadOnlyStream])
+def test_hashing_reader(source: type[_ReadOnlyStream]) -> None:
+    reader = HashingReader(source(b"Hello, World!"))
+    buffer = bytearray(5)
+
+    assert reader.read(3) == b"Hel"
+    assert reader.readinto(buffer) == 5
+    assert buffer == b"lo, W"
+    assert reader.read() == b"orld!"
+    assert reader.readinto(buffer) == 0
+
+    assert reader.size == 13
+    assert reader.hexdigest() == HELLO_WORLD_HASH
+    assert reader.digest() == bytes.fromhex(HELLO_WORLD_HASH)
+
+
+def test_hashing_reader_as_hash_stream_source() -> None:
+    reader = HashingReader(io.BytesIO(b"Hello, World!"), algorithm="md5")
+    digest = hash_stream(reader)
+
+    assert digest == HELLO_WORLD_HASH
+    assert reader.hexdigest() == hashlib.md5(b"Hello, World!").hexdigest()  # noqa: S324
+
+
+def test_hashing_writer() -> None:
+    target = io.BytesIO()
+    writer = HashingWriter(target)
+
+    assert writer.write(b"Hello, ") == 7
+    assert writer.write(memoryview(b"World!")) == 6
+
+    assert target.getvalue() == b"Hello, World!"
+    assert writer.size == 13
+    assert writer.hexdigest() == HELLO_WORLD_HASH
+    assert writer.digest() == bytes.fromhex(HELLO_WORLD_HASH)
+
+
+def test_hashing_writer_only_hashes_written_bytes() -> None:
+    target = _PartialWriter()
+    writer = HashingWriter(target, algorithm="md5")
+
+    assert writer.write(b"Hello") == 3
+    assert writer.write(b"") == 0
+
+    assert target.written == [b"Hel"]
+    assert writer.size == 3
+    assert writer.hexdigest() == hashlib.md5(b"Hel").hexdigest()  # noqa: S324
+
+
+def test_hashing_writer_treats_none_as_a_full_write() -> None:
+    class _SilentWriter:
+        def __init__(self) -> None:
+            self.written = bytearray()
+
+        def write(self, data: ReadableBuffer, /) -> None:
+            self.written += data
+
+    target = _SilentWriter()
+    writer = HashingWriter(target)
+
+    assert writer.write(b"Hello, ") == 7
+    assert writer.write(b"World!") == 6
+
+    assert target.written == b"Hello, World!"
+    assert writer.size == 13
+    assert writer.hexdigest() == HELLO_WORLD_HASH
+
+
+def test_copy_file(tmp_path: Path) -> None:
+    data = _random_bytes(300_000)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+    dst.write_bytes(b"previous content that is overwritten")
+
+    assert copy_file(src, dst) is None
+    assert dst.read_bytes() == data
+
+
+@pytest.mark.parametrize("algorithm", ["sha256", "md5", "blake2b"])
+def test_copy_file_with_algorithm(algorithm: str, tmp_path: Path) -> None:
+    data = _random_bytes(300_000)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+
+    digest = copy_file(src, dst, algorithm=algorithm, buffer_size=2**12)
+
+    assert digest == hashlib.new(algorithm, data).hexdigest()
+    assert dst.read_bytes() == data
+
+
+def _unsupported(_src: int, _dst: int, _count: int) -> int:
+    raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+
+def test_copy_file_falls_back_to_sendfile(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data = _random_bytes(100_000)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+    sendfile = mock.Mock(wraps=files_module._sendfile)
+    monkeypatch.setattr(files_module, "_copy_file_range", _unsupported)
+    monkeypatch.setattr(files_module, "_sendfile", sendfile)
+
+    copy_file(src, dst)
+
+    assert dst.read_bytes() == data
+    sendfile.assert_called()
+
+
+def test_copy_file_falls_back_to_buffered_copy(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data = _random_bytes(100_000)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+    monkeypatch.setattr(files_module, "_copy_file_range", _unsupported)
+    monkeypatch.setattr(files_module, "_sendfile", _unsupported)
+
+    assert copy_file(src, dst, buffer_size=2**10) is None
+    assert dst.read_bytes() == data
+
+
+def test_copy_file_without_kernel_copies(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data = _random_bytes(100_000)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    monkeypatch.delattr(os, "sendfile", raising=False)
+
+    copy_file(src, dst)
+
+    assert dst.read_bytes() == data
+
+
+def test_copy_file_resumes_after_partial_kernel_copy(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data = _random_bytes(100_000)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+    calls = itertools.count()
+
+    def copy_once(src_fd: int, dst_fd: int, _count: int) -> int:
+        if next(calls):
+            return _unsupported(src_fd, dst_fd, _count)
+        return os.copy_file_range(src_fd, dst_fd, 1000)
+
+    monkeypatch.setattr(files_module, "_copy_file_range", copy_once)
+    monkeypatch.setattr(files_module, "_sendfile", _unsupported)
+
+    copy_file(src, dst)
+
+    assert dst.read_bytes() == data
+
+
+def test_copy_file_propagates_copy_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"data")
+
+    def failing(_src: int, _dst: int, _count: int) -> int:
+        raise OSError(errno.EIO, os.strerror(errno.EIO))
+
+    monkeypatch.setattr(files_module, "_copy_file_range", failing)
+
+    with pytest.raises(OSError, match="Input/output error"):
+        copy_file(src, tmp_path / "dst.bin")
+
+
+def test_copy_file_rejects_copying_onto_itself(tmp_path: Path) -> None:
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"data")
+    link = tmp_path / "link.bin"
+    link.hardlink_to(src)
+
+    with pytest.raises(ValueError, match="onto itself"):
+        copy_file(src, link)
+
+    assert src.read_bytes() == b"data"
+
+
+def test_copy_file_validates_arguments_before_writing(tmp_path: Path) -> None:
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"data")
+    dst = tmp_path / "dst.bin"
+
+    with pytest.raises(ValueError, match="unsupported hash type"):
+        copy_file(src, dst, algorithm="nope")
+    with pytest.raises(ValueError, match="buffer_size must be at least 1"):
+        copy_file(src, dst, buffer_size=0)
+
+    assert not dst.exists()
+
+
+def _log_lines(count: int) -> list[bytes]:
+    rng = random.Random(count)  # noqa: S311
+    return [b"line %d %s\n" % (i, b"x" * rng.randrange(200)) for i in range(count)]
+
+
+@pytest.mark.parametrize("parts", [1, 2, 7, 64])
+def test_split_file(parts: int, tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    lines = _log_lines(2000)
+    path.write_bytes(b"".join(lines))
+
+    ranges = split_file(path, parts)
+
+    assert len(ranges) == parts
+    assert ranges[0].start == 0
+    assert ranges[-1].end == path.stat().st_size
+    assert all(a.end == b.start for a, b in itertools.pairwise(ranges))
+    sizes = [file_range.length for file_range in ranges]
+    assert max(sizes) - min(sizes) < 1000
+    read = [line for file_range in ranges for line in iter_lines(file_range)]
+    assert read == lines
+
+
+def test_split_file_with_delimiter(tmp_path: Path) -> None:
+    path = tmp_path / "records.bin"
+    records = [b"record %d" % i + b"\r\n" for i in range(1000)]
+    path.write_bytes(b"".join(records) + b"trailing")
+
+    ranges = split_file(path, 5, delimiter=b"\r\n")
+
+    assert len(ranges) == 5
+    assert {file_range.delimiter for file_range in ranges} == {b"\r\n"}
+    read = [
+        record
+        for file_range in ranges
+        for record in iter_lines(file_range, buffer_size=7)
+    ]
+    assert read == [*records, b"trailing"]
+
+
+@pytest.mark.parametrize(
+    ("content", "expected"),
+    [
+        (b"", []),
+        (b"no delimiter at all", [(0, 19)]),
+        (b"one\ntwo", [(0, 4), (4, 7)]),
+        (b"one\ntwo\n", [(0, 4), (4, 8)]),
+        (b"a long first line\nb\n", [(0, 18), (18, 20)]),
+    ],
+)
+def test_split_file_with_few_delimiters(
+    content: bytes, expected: list[tuple[int, int]], tmp_path: Path
+) -> None:
+    path = tmp_path / "small.txt"
+    path.write_bytes(content)
+
+    ranges = split_file(path, 10)
+
+    assert [(r.start, r.end) for r in ranges] == expected
+    assert b"".join(line for r in ranges for line in iter_lines(r)) == content
+
+
+def test_file_ranges_can_be_pickled(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"".join(_log_lines(100)))
+    file_range = split_file(path, 2)[1]
+
+    restored = pickle.loads(pickle.dumps(file_range))  # noqa: S301
+
+    assert restored == file_range
+    assert list(iter_lines(restored)) == list(iter_lines(file_range))
+
+
+def test_iter_lines_stops_at_end_of_file(tmp_path: Path) -> None:
+    path = tmp_path / "truncated.log"
+    path.write_bytes(b"one\ntwo")
+
+    lines = list(iter_lines(FileRange(path=path, start=4, end=100)))
+
+    assert lines == [b"two"]
+
+
+def test_split_file_validates_arguments(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"line\n")
+
+    with pytest.raises(ValueError, match="parts must be at least 1"):
+        split_file(path, 0)
+    with pytest.raises(ValueError, match="delimiter must not be empty"):
+        split_file(path, 2, delimiter=b"")
+    with pytest.raises(ValueError, match="delimiter must not be empty"):
+        next(iter_lines(FileRange(path=path, start=0, end=5, delimiter=b"")))
+    with pytest.raises(ValueError, match="buffer_size must be at least 1"):
+        next(iter_lines(FileRange(path=path, start=0, end=5), buffer_size=0))
+
+
+def _append(path: Path, data: bytes) -> None:
+    with path.open("ab") as f:
+        f.write(data)
+
+
+def test_follower_reads_appended_lines(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"old line\n")
+
+    with Follower(path) as follower:
+        assert follower.poll() == []
+        _append(path, b"first\nsecond\nthi")
+        assert follower.poll() == [b"first\n", b"second\n"]
+        assert follower.poll() == []
+        _append(path, b"rd\n")
+        assert follower.poll() == [b"third\n"]
+
+
+def test_follower_from_start(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"one\0two\0")
+
+    with Follower(path, from_start=True, delimiter=b"\0") as follower:
+        assert follower.poll() == [b"one\0", b"two\0"]
+
+
+def test_follower_reads_lines_longer_than_the_buffer(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"")
+    long_line = b"x" * 1000 + b"\n"
+
+    with Follower(path, buffer_size=64) as follower:
+        _append(path, long_line + b"short")
+        assert follower.poll() == [long_line]
+        _append(path, b"\n")
+        assert follower.poll() == [b"short\n"]
+
+
+def test_follower_handles_rotation(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"")
+    rotated = tmp_path / "app.log.1"
+
+    with Follower(path) as follower:
+        _append(path, b"before\n")
+        path.rename(rotated)
+        _append(rotated, b"late\nunterminated")
+        assert follower.poll() == [b"before\n", b"late\n"]
+        assert follower.poll() == []
+
+        path.write_bytes(b"new\n")
+        assert follower.poll() == [b"unterminated"]
+        assert follower.poll() == [b"new\n"]
+
+
+def test_follower_reads_lines_written_while_rotating(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"")
+    rotated = tmp_path / "app.log.1"
+    stat = Path.stat
+
+    def racing_stat(self: Path, *, follow_symlinks: bool = True) -> os.stat_result:
+        _append(rotated, b"raced\n")
+        return stat(self, follow_symlinks=follow_symlinks)
+
+    with Follower(path) as follower:
+        path.rename(rotated)
+        path.write_bytes(b"new\n")
+        monkeypatch.setattr(Path, "stat", racing_stat)
+        assert follower.poll() == [b"raced\n"]
+        monkeypatch.undo()
+        assert follower.poll() == [b"new\n"]
+
+
+def test_follower_handles_truncation(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"")
+
+    with Follower(path) as follower:
+        _append(path, b"a fairly long line\npartial")
+        assert follower.poll() == [b"a fairly long line\n"]
+        path.write_bytes(b"short\n")
+        assert follower.poll() == []
+        assert follower.poll() == [b"short\n"]
+
+
+def test_follower_waits_for_missing_file(tmp_path: Path) -> None:
+    path = tmp_path / "app.log"
+
+    follower = Follower(path)
+    assert follower.poll() == []
+    path.write_bytes(b"created\n")
+    assert follower.poll() == [b"created\n"]
+    follower.close()
+    follower.close()
+
+
+def test_follow_backs_off_while_idle(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "app.log"
+    path.write_bytes(b"")
+    delays: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        delays.append(seconds)
+        if len(delays) in {4, 6}:
+            _append(path, b"line %d\n" % len(delays))
+
+    monkeypatch.setattr(time, "sleep", sleep)
+    lines = follow(
+        path,
+        min_interval=Timing(milliseconds=10),
+        max_interval=Timing(milliseconds=25),
+    )
+
+    assert next(lines) == b"line 4\n"
+    assert next(lines) == b"line 6\n"
+    lines.close()
+
+    assert delays == [0.01, 0.02, 0.025, 0.025, 0.01, 0.02]
+
+
+@pytest.mark.parametrize(
+    ("min_interval", "max_interval"),
+    [
+        (Timing(), Timing(seconds=1)),
+        (Timing(seconds=2), Timing(seconds=1)),
+    ],
+)
+def test_follow_rejects_invalid_intervals(
+    min_interval: Timing, max_interval: Timing, tmp_path: Path
+) -> None:
+    with pytest.raises(ValueError, match="Poll intervals must satisfy"):
+        follow(
+            tmp_path / "app.log", min_interval=min_interval, max_interval=max_interval
+        )
+
+
+def test_find_duplicates(tmp_path: Path) -> None:
+    large = _random_bytes(10_000)
+    files = {
+        "small-a.txt": b"same",
+        "small-b.txt": b"same",
+        "small-c.txt": b"diff",
+        "unique.txt": b"unique size",
+        "large-a.bin": large,
+        "large-b.bin": large,
+        "large-c.bin": large[:5000] + b"x" + large[5001:],
+        "large-d.bin": b"y" + large[1:],
+    }
+    for name, content in files.items():
+        (tmp_path / name).write_bytes(content)
+    (tmp_path / "directory").mkdir()
+    paths = [tmp_path / name for name in files]
+    paths += [
+        tmp_path / "directory",
+        tmp_path / "missing.txt",
+        tmp_path / "small-a.txt",
+    ]
+
+    duplicates = find_duplicates(paths, sample_size=1024, workers=2)
+
+    assert duplicates == [
+        [tmp_path / "small-a.txt", tmp_path / "small-b.txt"],
+        [tmp_path / "large-a.bin", tmp_path / "large-b.bin"],
+    ]
+
+
+def test_find_duplicates_only_reads_colliding_files(tmp_path: Path) -> None:
+    large = _random_bytes(10_000)
+    (tmp_path / "a.bin").write_bytes(large)
+    (tmp_path / "b.bin").write_bytes(large[:5000] + b"x" + large[5001:])
+    (tmp_path / "c.bin").write_bytes(b"y" + large[1:])
+    (tmp_path / "d.bin").write_bytes(b"unique size")
+    paths = sorted(tmp_path.iterdir())
+
+    with mock.patch.object(
+        files_module, "hash_file", wraps=files_module.hash_file
+    ) as hashed:
+        duplicates = find_duplicates(paths, sample_size=100)
+
+    assert duplicates == []
+    assert sorted(call.args[0] for call in hashed.call_args_list) == [
+        tmp_path / "a.bin",
+        tmp_path / "b.bin",
+    ]
+
+
+def test_find_duplicates_reports_hard_links_without_reading(tmp_path: Path) -> None:
+    original = tmp_path / "original.txt"
+    original.write_bytes(b"content")
+    link = tmp_path / "link.txt"
+    link.hardlink_to(original)
+
+    with mock.patch.object(files_module, "hash_file") as hashed:
+        duplicates = find_duplicates([link, original])
+
+    assert duplicates == [[link, original]]
+    hashed.assert_not_called()
+
+
+def test_find_duplicates_skips_files_that_vanish(tmp_path: Path) -> None:
+    for name in ("a.bin", "b.bin", "c.txt", "d.txt"):
+        (tmp_path / name).write_bytes(b"x" * (10_000 if name.endswith("bin") else 10))
+    paths = sorted(tmp_path.iterdir())
+
+    with (
+        mock.patch.object(
+            files_module, "_sample_digest", side_effect=FileNotFoundError
+        ),
+        mock.patch.object(files_module, "hash_file", side_effect=FileNotFoundError),
+    ):
+        assert find_duplicates(paths, sample_size=100) == []
+
+
+def test_find_duplicates_rejects_non_positive_sample_size() -> None:
+    with pytest.raises(ValueError, match="sample_size must be at least 1"):
+        find_duplicates([], sample_size=0)
+
+
+def _sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def test_verify_manifest(tmp_path: Path) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "good.txt").write_bytes(b"good")
+    (tmp_path / "sub" / "binary.bin").write_bytes(b"binary")
+    (tmp_path / "bad.txt").write_bytes(b"tampered")
+    (tmp_path / "extra.txt").write_bytes(b"extra")
+    (tmp_path / "legacy.txt").write_bytes(b"legacy")
+    (tmp_path / "a\\b\nc.txt").write_bytes(b"escaped")
+    manifest = tmp_path / "SHA256SUMS"
+    manifest.write_text(
+        "# release checksums\n"
+        "\n"
+        f"{_sha256(b'good')}  good.txt\n"
+        f"{_sha256(b'binary').upper()} *sub/binary.bin\r\n"
+        f"{_sha256(b'bad')}  bad.txt\n"
+        f"{_sha256(b'missing')}  missing.txt\n"
+        f"{_sha256(b'directory')}  sub\n"
+        f"MD5 (legacy.txt) = {hashlib.md5(b'legacy').hexdigest()}\n"  # noqa: S324
+        f"\\{_sha256(b'escaped')}  a\\\\b\\nc.txt\n"
+        "not a checksum line\n"
+        f"{hashlib.md5(b'good').hexdigest()}  good.txt\n"  # noqa: S324
+        f"CRC32 (good.txt) = {'0' * 8}\n"
+    )
+
+    report = verify_manifest(manifest, workers=2)
+
+    assert report == ManifestReport(
+        verified=4,
+        missing=(tmp_path / "missing.txt",),
+        mismatched=(tmp_path / "bad.txt",),
+        unreadable=(tmp_path / "sub",),
+        extra=(tmp_path / "extra.txt",),
+        malformed=(10, 11, 12),
+        complete=True,
+    )
+    assert not report.ok
+
+
+def test_verify_manifest_ok(tmp_path: Path) -> None:
+    root = tmp_path / "release"
+    root.mkdir()
+    (root / "app.tar.gz").write_bytes(b"app")
+    manifest = tmp_path / "release.b2"
+    digest = hashlib.blake2b(b"app").hexdigest()
+    manifest.write_text(f"{digest}  app.tar.gz\n")
+
+    report = verify_manifest(manifest, root, algorithm="blake2b")
+
+    assert report.ok
+    assert report.verified == 1
+    assert report.extra == ()
+
+
+def test_verify_manifest_without_extra_check(tmp_path: Path) -> None:
+    (tmp_path / "listed.txt").write_bytes(b"listed")
+    (tmp_path / "unlisted.txt").write_bytes(b"unlisted")
+    manifest = tmp_path / "SHA256SUMS"
+    manifest.write_text(f"{_sha256(b'listed')}  listed.txt\n")
+
+    report = verify_manifest(manifest, check_extra=False)
+
+    assert report.ok
+    assert report.extra == ()
+
+
+def test_verify_manifest_fail_fast(tmp_path: Path) -> None:
+    for index in range(20):
+        (tmp_path / f"{index}.txt").write_bytes(b"content")
+    manifest = tmp_path / "SHA256SUMS"
+    manifest.write_text(
+        "".join(f"{_sha256(b'other')}  {index}.txt\n" for index in range(20))
+    )
+
+    report = verify_manifest(manifest, workers=1, fail_fast=True)
+
+    assert not report.complete
+    assert not report.ok
+    assert len(report.mismatched) == 1
+    assert report.extra == ()
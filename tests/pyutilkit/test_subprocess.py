@@ -1,19 +1,36 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
+import copy
+import dataclasses
 import io
 import os
 import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
-from typing import cast
+from typing import TYPE_CHECKING, cast
 from unittest import mock
 
 import pytest
 
 import pyutilkit.subprocess as subprocess_module
-from pyutilkit.subprocess import run_command
-from pyutilkit.timing import Timing
+from pyutilkit.subprocess import (
+    Capture,
+    CapturedOutput,
+    DrainEngine,
+    ProcessOutput,
+    async_run_command,
+    run_command,
+    run_commands,
+    stream_command,
+)
+from pyutilkit.timing import Stopwatch, Timing
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
 
 
 def test_run_command() -> None:
@@ -214,3 +231,705 @@ def test_run_command_chains_both_stream_echo_errors(tmp_path: Path) -> None:
     assert {str(exc_info.value), str(cause)} == {"stdout failed", "stderr failed"}
     assert cause.__cause__ is None
     assert completion_marker.read_text() == "done"
+
+
+def test_async_run_command() -> None:
+    command = [
+        sys.executable,
+        "-c",
+        (
+            "import sys; sys.stdout.buffer.write(b'Hello, World!\\n'); "
+            "sys.stderr.buffer.write(b'error'); raise SystemExit(3)"
+        ),
+    ]
+    output = asyncio.run(async_run_command(command))
+    assert output.stdout == b"Hello, World!\n"
+    assert output.stderr == b"error"
+    assert output.returncode == 3
+    assert output.elapsed > Timing(nanoseconds=0)
+    assert output.pid > 0
+
+
+def test_async_run_command_rejects_string_commands() -> None:
+    command = cast("list[str]", "echo 'Hello from shell'")
+    with pytest.raises(TypeError, match="command must be a list of argument strings"):
+        asyncio.run(async_run_command(command))
+
+
+def test_async_run_command_runs_concurrently() -> None:
+    child_code = "import sys, time; time.sleep(0.2); print(sys.argv[1])"
+
+    async def main() -> list[ProcessOutput]:
+        return await asyncio.gather(
+            *(
+                async_run_command([sys.executable, "-c", child_code, str(index)])
+                for index in range(10)
+            )
+        )
+
+    stopwatch = Stopwatch()
+    with stopwatch, contextlib.redirect_stdout(io.StringIO()):
+        outputs = asyncio.run(main())
+
+    assert [output.stdout for output in outputs] == [
+        f"{index}{os.linesep}".encode() for index in range(10)
+    ]
+    assert stopwatch.elapsed < Timing(seconds=2)
+
+
+def test_async_run_command_drains_long_lines() -> None:
+    child_code = (
+        "import sys; "
+        "sys.stdout.buffer.write(b'x' * 1_000_000 + b'\\nend'); "
+        "sys.stderr.buffer.write(b'done\\n')"
+    )
+    echoed: list[bytes] = []
+
+    def record_output(stream: object, line: bytes) -> None:
+        del stream
+        echoed.append(line)
+
+    with mock.patch.object(subprocess_module, "_write_output", record_output):
+        output = asyncio.run(async_run_command([sys.executable, "-c", child_code]))
+
+    assert output.stdout == b"x" * 1_000_000 + b"\nend"
+    assert output.stderr == b"done\n"
+    echoed_stdout = [line for line in echoed if line != b"done\n"]
+    assert b"".join(echoed_stdout) == output.stdout
+    assert len(echoed_stdout) > 2
+    assert echoed_stdout[-1] == b"end"
+
+
+def test_async_run_command_chains_both_stream_echo_errors(tmp_path: Path) -> None:
+    completion_marker = tmp_path / "both-streams-complete"
+    child_code = (
+        "import pathlib, sys, time; "
+        "print('stdout failed', flush=True); "
+        "print('stderr failed', file=sys.stderr, flush=True); "
+        "time.sleep(0.2); "
+        "print('after', flush=True); "
+        f"pathlib.Path({str(completion_marker)!r}).write_text('done')"
+    )
+
+    def fail_echo(stream: object, line: bytes) -> None:
+        del stream
+        raise BrokenPipeError(line.decode().strip())
+
+    with (
+        mock.patch.object(subprocess_module, "_write_output", fail_echo),
+        pytest.raises(BrokenPipeError) as exc_info,
+    ):
+        asyncio.run(async_run_command([sys.executable, "-c", child_code]))
+
+    cause = exc_info.value.__cause__
+    assert cause is not None
+    assert {str(exc_info.value), str(cause)} == {"stdout failed", "stderr failed"}
+    assert cause.__cause__ is None
+    assert completion_marker.read_text() == "done"
+
+
+def test_async_run_command_kills_process_when_cancelled(tmp_path: Path) -> None:
+    completion_marker = tmp_path / "complete"
+    child_code = (
+        "import pathlib, time; "
+        "print('ready', flush=True); "
+        "time.sleep(5); "
+        f"pathlib.Path({str(completion_marker)!r}).write_text('done')"
+    )
+    ready = asyncio.Event()
+
+    def observe_output(stream: object, line: bytes) -> None:
+        del stream, line
+        ready.set()
+
+    async def main() -> None:
+        task = asyncio.create_task(
+            async_run_command([sys.executable, "-c", child_code])
+        )
+        await ready.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with mock.patch.object(subprocess_module, "_write_output", observe_output):
+        stopwatch = Stopwatch()
+        with stopwatch:
+            asyncio.run(main())
+
+    assert stopwatch.elapsed < Timing(seconds=5)
+    assert not completion_marker.exists()
+
+
+def test_run_command_records_command() -> None:
+    command = [sys.executable, "-c", "pass"]
+    assert run_command(command).command == tuple(command)
+    assert asyncio.run(async_run_command(command)).command == tuple(command)
+
+
+def test_run_commands() -> None:
+    commands = [
+        [
+            sys.executable,
+            "-c",
+            f"import time; time.sleep(0.2); raise SystemExit({code})",
+        ]
+        for code in range(6)
+    ]
+
+    stopwatch = Stopwatch()
+    with stopwatch:
+        outputs = list(run_commands(commands, max_workers=3))
+
+    assert sorted(output.command for output in outputs) == sorted(
+        tuple(command) for command in commands
+    )
+    assert all(output.returncode == int(output.command[-1][-2]) for output in outputs)
+    assert stopwatch.elapsed < Timing(milliseconds=6 * 200)
+
+
+def test_run_commands_bounds_concurrency(tmp_path: Path) -> None:
+    child_code = (
+        "import os, pathlib, sys, time; "
+        f"running = pathlib.Path({str(tmp_path)!r}); "
+        "marker = running / sys.argv[1]; "
+        "marker.touch(); "
+        "print(len(os.listdir(running)), flush=True); "
+        "time.sleep(0.1); "
+        "marker.unlink()"
+    )
+    commands = ([sys.executable, "-c", child_code, str(index)] for index in range(6))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        outputs = list(run_commands(commands, max_workers=2))
+
+    assert len(outputs) == 6
+    assert max(int(output.stdout) for output in outputs) <= 2
+
+
+def test_run_commands_fail_fast() -> None:
+    commands = [
+        [sys.executable, "-c", "raise SystemExit(1)"],
+        [sys.executable, "-c", "pass"],
+    ]
+
+    outputs = list(run_commands(commands, max_workers=1, fail_fast=True))
+
+    assert [output.returncode for output in outputs] == [1]
+    assert sorted(output.returncode for output in run_commands(commands)) == [0, 1]
+
+
+def test_run_commands_propagates_errors() -> None:
+    commands = [[sys.executable, "-c", "pass"], cast("list[str]", "echo hello")]
+
+    outputs = run_commands(commands, max_workers=1)
+
+    assert next(outputs).returncode == 0
+    with pytest.raises(TypeError, match="command must be a list of argument strings"):
+        next(outputs)
+
+
+def test_run_commands_rejects_non_positive_max_workers() -> None:
+    with pytest.raises(ValueError, match="max_workers must be at least 1"):
+        run_commands([], max_workers=0)
+
+
+def test_run_commands_defaults_to_cpu_count() -> None:
+    with mock.patch.object(os, "cpu_count", return_value=None):
+        assert list(run_commands([])) == []
+
+
+def test_write_output_does_not_interleave_lines() -> None:
+    events: list[bytes] = []
+
+    class SlowStream:
+        def write(self, line: bytes) -> None:
+            events.append(line)
+            time.sleep(0.001)
+            events.append(line)
+
+        def flush(self) -> None:
+            events.append(b"flush")
+
+    stream = cast("BinaryIO", SlowStream())
+
+    def echo(line: bytes) -> None:
+        for _ in range(10):
+            subprocess_module._write_output(stream, line)
+
+    threads = [
+        threading.Thread(target=echo, args=(f"{index}\n".encode(),))
+        for index in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(events) == 4 * 10 * 3
+    for index in range(0, len(events), 3):
+        first, second, flush = events[index : index + 3]
+        assert first == second
+        assert flush == b"flush"
+
+
+def test_stream_command() -> None:
+    command = [
+        sys.executable,
+        "-c",
+        (
+            "import sys; "
+            "sys.stdout.buffer.write(b'out' * 10_000); "
+            "sys.stderr.buffer.write(b'err'); "
+            "raise SystemExit(2)"
+        ),
+    ]
+    received: dict[str, list[bytes]] = {"stdout": [], "stderr": []}
+
+    with stream_command(command, chunk_size=1024) as events:
+        with pytest.raises(RuntimeError, match="The command is still running"):
+            _ = events.output
+        for stream, chunk in events:
+            assert len(chunk) <= 1024
+            received[stream].append(chunk)
+
+    assert b"".join(received["stdout"]) == b"out" * 10_000
+    assert b"".join(received["stderr"]) == b"err"
+    assert events.output.returncode == 2
+    assert events.output.stdout == b""
+    assert events.output.elapsed > Timing(nanoseconds=0)
+    assert events.output.command == tuple(command)
+
+
+def test_stream_command_applies_backpressure(tmp_path: Path) -> None:
+    completion_marker = tmp_path / "complete"
+    child_code = (
+        "import pathlib, sys; "
+        "sys.stdout.buffer.write(b'x' * 4_000_000); "
+        "sys.stdout.flush(); "
+        f"pathlib.Path({str(completion_marker)!r}).write_text('done')"
+    )
+    total = 0
+
+    with stream_command(
+        [sys.executable, "-c", child_code], chunk_size=1024, max_pending=2
+    ) as events:
+        iterator = iter(events)
+        total += len(next(iterator)[1])
+        time.sleep(0.3)
+        assert not completion_marker.exists()
+        total += sum(len(chunk) for _, chunk in iterator)
+
+    assert total == 4_000_000
+    assert completion_marker.read_text() == "done"
+    assert events.output.returncode == 0
+
+
+def test_stream_command_kills_unfinished_process() -> None:
+    child_code = "import time; print('ready', flush=True); time.sleep(5)"
+
+    with stream_command([sys.executable, "-c", child_code]) as events:
+        for stream, chunk in events:
+            assert (stream, chunk.strip()) == ("stdout", b"ready")
+            break
+
+    assert events.output.returncode != 0
+    assert events.output.elapsed < Timing(seconds=5)
+
+
+def test_stream_command_validates_arguments() -> None:
+    command = [sys.executable, "-c", "pass"]
+    with (
+        pytest.raises(ValueError, match="chunk_size and max_pending must be"),
+        stream_command(command, max_pending=0),
+    ):
+        pass
+    with (
+        pytest.raises(TypeError, match="command must be a list of argument strings"),
+        stream_command(cast("list[str]", "echo hello")),
+    ):
+        pass
+
+
+def test_process_output_is_a_plain_dataclass() -> None:
+    output = run_command([sys.executable, "-c", "print('out')"])
+    failed = dataclasses.replace(output, returncode=1)
+
+    assert output.captured_stdout is None
+    assert failed.stdout == output.stdout == b"out\n"
+    assert failed.returncode == 1
+    assert dataclasses.asdict(output)["stdout"] == b"out\n"
+    assert [field.name for field in dataclasses.fields(output)][:2] == [
+        "stdout",
+        "stderr",
+    ]
+    assert "stdout=b'out\\n'" in repr(output)
+
+
+def test_process_output_ignores_captured_output_in_comparisons() -> None:
+    captured = CapturedOutput(Capture(tail=3))
+    captured.write(b"output")
+    output = ProcessOutput(
+        b"put", b"", 1, 0, Timing(seconds=1), captured_stdout=captured
+    )
+
+    assert output == ProcessOutput(b"put", b"", 1, 0, Timing(seconds=1))
+    assert hash(output) == hash(ProcessOutput(b"put", b"", 1, 0, Timing(seconds=1)))
+    assert "captured" not in repr(output)
+    assert repr(output.captured_stdout) == "CapturedOutput(size=6, dropped=3)"
+
+
+@pytest.mark.parametrize(
+    ("capture", "expected", "dropped"),
+    [
+        (Capture(), b"0123456789abcdef", 0),
+        (Capture(tail=5), b"bcdef", 11),
+        (Capture(head=3, tail=4), b"012cdef", 9),
+        (Capture(head=20, tail=4), b"0123456789abcdef", 0),
+        (Capture(head=3, tail=0), b"012", 13),
+        (Capture(spill_after=5), b"0123456789abcdef", 0),
+    ],
+)
+def test_captured_output(capture: Capture, expected: bytes, dropped: int) -> None:
+    captured = CapturedOutput(capture)
+    for piece in (b"0123", b"", b"456789a", b"b", b"cdef"):
+        captured.write(piece)
+
+    assert captured.getvalue() == expected
+    assert captured.size == 16
+    assert captured.dropped == dropped
+    assert captured.spilled is (capture.spill_after is not None)
+
+
+def test_captured_output_compares_by_identity() -> None:
+    captured = CapturedOutput()
+    outputs = {captured}
+    captured.write(b"data")
+    other = CapturedOutput()
+    other.write(b"data")
+
+    assert captured in outputs
+    assert captured != other
+
+
+def test_captured_output_reads_spilled_data_in_chunks() -> None:
+    captured = CapturedOutput(Capture(spill_after=0))
+    captured.write(b"abcdefg")
+
+    assert list(captured.iter_chunks(3)) == [b"abc", b"def", b"g"]
+    captured.write(b"h")
+    assert captured.getvalue() == b"abcdefgh"
+
+
+def test_captured_output_reads_spilled_data_concurrently() -> None:
+    data = bytes(range(256)) * 64
+    captured = CapturedOutput(Capture(spill_after=0))
+    captured.write(data)
+
+    first = captured.iter_chunks(100)
+    second = captured.iter_chunks(100)
+    pairs = list(zip(first, second, strict=True))
+    assert b"".join(chunk for chunk, _ in pairs) == data
+    assert b"".join(chunk for _, chunk in pairs) == data
+
+    results: list[bytes] = []
+    threads = [
+        threading.Thread(target=lambda: results.append(captured.getvalue()))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [data] * 4
+
+
+def test_captured_output_closes_spilled_file() -> None:
+    with CapturedOutput(Capture(spill_after=0)) as captured:
+        captured.write(b"data")
+        assert captured.getvalue() == b"data"
+
+    assert captured.spilled
+    with pytest.raises(ValueError, match="closed file"):
+        captured.getvalue()
+    with CapturedOutput() as kept:
+        kept.write(b"data")
+    assert kept.getvalue() == b"data"
+
+
+def test_process_output_closes_spilled_files() -> None:
+    command = [sys.executable, "-c", "print('out')"]
+    with mock.patch.object(subprocess_module, "_write_output"):
+        spilled = run_command(command, capture=Capture(spill_after=0))
+        output = run_command(command)
+
+    with spilled:
+        assert spilled.captured_stdout is not None
+        assert spilled.captured_stdout.getvalue() == b"out\n"
+    with pytest.raises(ValueError, match="closed file"):
+        spilled.captured_stdout.getvalue()
+    with output:
+        pass
+    assert output.stdout == b"out\n"
+
+
+@pytest.mark.parametrize(
+    ("capture", "message"),
+    [
+        (Capture(tail=-1), "Capture sizes cannot be negative"),
+        (Capture(head=1), "Capture head requires a tail"),
+        (Capture(tail=1, spill_after=1), "spill_after cannot be combined"),
+    ],
+)
+def test_capture_validation(capture: Capture, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        CapturedOutput(capture)
+    with pytest.raises(ValueError, match=message):
+        run_command([sys.executable, "-c", "pass"], capture=capture)
+    with pytest.raises(ValueError, match=message):
+        run_commands([], capture=capture)
+
+
+def test_run_command_bounds_capture() -> None:
+    child_code = (
+        "import sys; "
+        "sys.stdout.buffer.write(b'x' * 1_000_000 + b'tail'); "
+        "sys.stderr.buffer.write(b'head' + b'y' * 1_000_000)"
+    )
+
+    with mock.patch.object(subprocess_module, "_write_output"):
+        output = run_command(
+            [sys.executable, "-c", child_code], capture=Capture(head=4, tail=4)
+        )
+
+    assert output.stdout == b"xxxxtail"
+    assert output.stderr == b"headyyyy"
+    assert output.captured_stdout is not None
+    assert output.captured_stdout.size == 1_000_004
+    assert output.captured_stdout.dropped == 999_996
+    copied = copy.deepcopy(output.captured_stdout)
+    assert (copied.getvalue(), copied.dropped) == (b"xxxxtail", 999_996)
+
+
+def test_run_command_spills_capture() -> None:
+    child_code = "import sys; sys.stdout.buffer.write(b'line\\n' * 100_000)"
+
+    with mock.patch.object(subprocess_module, "_write_output"):
+        output = asyncio.run(
+            async_run_command(
+                [sys.executable, "-c", child_code], capture=Capture(spill_after=1024)
+            )
+        )
+    (batch_output,) = run_commands(
+        [[sys.executable, "-c", child_code]], capture=Capture(spill_after=1024)
+    )
+
+    for result in (output, batch_output):
+        assert result.captured_stdout is not None
+        assert result.captured_stderr is not None
+        assert result.captured_stdout.spilled
+        assert not result.captured_stderr.spilled
+        assert result.stdout == b""
+        assert result.captured_stdout.getvalue() == b"line\n" * 100_000
+        copied = dataclasses.asdict(result)["captured_stdout"]
+        assert copied.spilled
+        assert copied.getvalue() == result.captured_stdout.getvalue()
+
+
+@pytest.mark.parametrize("engine", ["threads", "selector"])
+def test_run_command_engines(engine: DrainEngine) -> None:
+    child_code = (
+        "import sys; "
+        "sys.stdout.buffer.write(b'one\\ntwo\\n' + b'x' * 100_000 + b'\\nlast'); "
+        "sys.stderr.buffer.write(b'error\\n'); "
+        "raise SystemExit(4)"
+    )
+    echoed: list[tuple[str, bytes]] = []
+    threads: set[str] = set()
+
+    def record_output(stream: object, line: bytes) -> None:
+        name = "stderr" if stream is getattr(sys.stderr, "buffer", None) else "stdout"
+        echoed.append((name, line))
+        threads.add(threading.current_thread().name)
+
+    with mock.patch.object(subprocess_module, "_write_output", record_output):
+        output = run_command([sys.executable, "-c", child_code], engine=engine)
+
+    assert output.stdout == b"one\ntwo\n" + b"x" * 100_000 + b"\nlast"
+    assert output.stderr == b"error\n"
+    assert output.returncode == 4
+    assert output.elapsed > Timing(nanoseconds=0)
+    stdout_lines = [line for name, line in echoed if name == "stdout"]
+    assert stdout_lines[:2] == [b"one\n", b"two\n"]
+    assert [len(line) for line in stdout_lines[2:]] == [65536, 100_001 - 65536, 4]
+    assert [line for name, line in echoed if name == "stderr"] == [b"error\n"]
+    if engine == "selector":
+        assert threads == {threading.current_thread().name}
+
+
+def test_run_command_selector_streams_before_process_exit(tmp_path: Path) -> None:
+    completion_marker = tmp_path / "complete"
+    child_code = (
+        "import pathlib, sys, time; "
+        "sys.stdout.buffer.write(b'rea'); "
+        "sys.stdout.buffer.flush(); "
+        "time.sleep(0.1); "
+        "sys.stdout.buffer.write(b'dy\\n'); "
+        "sys.stdout.buffer.flush(); "
+        "time.sleep(0.2); "
+        f"pathlib.Path({str(completion_marker)!r}).write_text('done'); "
+        "sys.stdout.buffer.write(b'after\\n')"
+    )
+    marker_states: list[tuple[bytes, bool]] = []
+
+    def observe_output(stream: object, line: bytes) -> None:
+        del stream
+        marker_states.append((line, completion_marker.exists()))
+
+    with mock.patch.object(subprocess_module, "_write_output", observe_output):
+        output = run_command([sys.executable, "-c", child_code], engine="selector")
+
+    assert output.stdout == b"ready\nafter\n"
+    assert marker_states == [(b"ready\n", False), (b"after\n", True)]
+
+
+def test_run_command_selector_chains_echo_errors() -> None:
+    child_code = (
+        "import sys; "
+        "sys.stdout.buffer.write(b'stdout failed\\nmore\\n'); "
+        "sys.stdout.flush(); "
+        "print('stderr failed', file=sys.stderr, flush=True)"
+    )
+
+    def fail_echo(stream: object, line: bytes) -> None:
+        del stream
+        raise BrokenPipeError(line.decode().strip())
+
+    with (
+        mock.patch.object(subprocess_module, "_write_output", fail_echo),
+        pytest.raises(BrokenPipeError) as exc_info,
+    ):
+        run_command([sys.executable, "-c", child_code], engine="selector")
+
+    cause = exc_info.value.__cause__
+    assert cause is not None
+    assert {str(exc_info.value), str(cause)} == {"stdout failed", "stderr failed"}
+
+
+def test_run_command_selector_without_binary_parent_streams() -> None:
+    command = [sys.executable, "-c", "print('output')"]
+
+    with contextlib.redirect_stdout(io.StringIO()) as redirected_stdout:
+        output = run_command(command, engine="selector")
+
+    assert output.stdout == b"output" + os.linesep.encode()
+    assert redirected_stdout.getvalue() == ""
+
+
+def test_run_command_selector_polls_without_pidfd(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.delattr(os, "pidfd_open", raising=False)
+    child_code = (
+        "import os, sys, time; "
+        "print('closing', flush=True); "
+        "os.close(1); os.close(2); "
+        "time.sleep(0.1)"
+    )
+
+    with mock.patch.object(subprocess_module, "_write_output"):
+        output = run_command([sys.executable, "-c", child_code], engine="selector")
+
+    assert output.stdout == b"closing" + os.linesep.encode()
+    assert output.returncode == 0
+    assert output.elapsed >= Timing(milliseconds=100)
+
+
+def test_run_commands_selector(tmp_path: Path) -> None:
+    child_code = (
+        "import os, pathlib, sys, time; "
+        f"running = pathlib.Path({str(tmp_path)!r}); "
+        "marker = running / sys.argv[1]; "
+        "marker.touch(); "
+        "print(len(os.listdir(running)), flush=True); "
+        "time.sleep(0.1); "
+        "marker.unlink(); "
+        "raise SystemExit(int(sys.argv[1]))"
+    )
+    commands = ([sys.executable, "-c", child_code, str(index)] for index in range(6))
+
+    with mock.patch.object(subprocess_module, "_write_output"):
+        outputs = list(run_commands(commands, max_workers=2, engine="selector"))
+
+    assert sorted(output.returncode for output in outputs) == list(range(6))
+    assert max(int(output.stdout) for output in outputs) <= 2
+    assert all(output.command[-1] == str(output.returncode) for output in outputs)
+
+
+def test_run_commands_selector_fail_fast_and_errors() -> None:
+    commands = [
+        [sys.executable, "-c", "raise SystemExit(1)"],
+        [sys.executable, "-c", "pass"],
+    ]
+    outputs = run_commands(commands, max_workers=1, fail_fast=True, engine="selector")
+    assert [output.returncode for output in outputs] == [1]
+
+    invalid = run_commands(
+        [[sys.executable, "-c", "pass"], cast("list[str]", "echo hello")],
+        max_workers=1,
+        engine="selector",
+    )
+    assert next(invalid).returncode == 0
+    with pytest.raises(TypeError, match="command must be a list of argument strings"):
+        next(invalid)
+
+
+@pytest.mark.parametrize("engine", ["threads", "selector"])
+def test_run_commands_kills_unfinished_commands(engine: DrainEngine) -> None:
+    commands = [
+        [sys.executable, "-c", "pass"],
+        [sys.executable, "-c", "import time; time.sleep(5)"],
+    ]
+    stopwatch = Stopwatch()
+    with stopwatch:
+        outputs = run_commands(commands, max_workers=2, engine=engine)
+        assert next(outputs).returncode == 0
+        outputs.close()
+
+    assert stopwatch.elapsed < Timing(seconds=5)
+
+
+def test_run_commands_kills_commands_started_after_close() -> None:
+    group = subprocess_module._ProcessGroup()
+    group.kill()
+    with subprocess.Popen(
+        [sys.executable, "-c", "import time; time.sleep(5)"]
+    ) as process:
+        group.add(process)
+
+    assert process.returncode != 0
+
+
+def test_run_command_rejects_unknown_engine() -> None:
+    command = [sys.executable, "-c", "pass"]
+    engine = cast("DrainEngine", "poll")
+    with pytest.raises(ValueError, match="Unsupported drain engine 'poll'"):
+        run_command(command, engine=engine)
+    with pytest.raises(ValueError, match="Unsupported drain engine 'poll'"):
+        run_commands([command], engine=engine)
+
+
+def test_run_command_selector_falls_back_to_threads_on_windows(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(sys, "platform", "win32")
+    threads: set[str] = set()
+
+    def record_output(stream: object, line: bytes) -> None:
+        del stream, line
+        threads.add(threading.current_thread().name)
+
+    with mock.patch.object(subprocess_module, "_write_output", record_output):
+        output = run_command([sys.executable, "-c", "print(1)"], engine="selector")
+
+    assert output.returncode == 0
+    assert threads == {f"pyutilkit-stdout-{output.pid}"}